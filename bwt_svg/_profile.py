@@ -0,0 +1,85 @@
+"""
+Profile render() and print the functions that dominate its run time.
+
+    python -m bwt_svg._profile 'how$now$brown$cow$#' --show-mums
+    python -m bwt_svg._profile --random 300 --docs 3 --show-thresholds -o out.prof
+    python -m bwt_svg._profile --load out.prof
+
+--random builds a reproducible multi-document DNA text of the given total
+length, for inputs too long to type.  --load prints a profile saved earlier,
+e.g. by this script's -o or by
+python -m cProfile -o out.prof -m bwt_svg render ...
+
+docs/perf_baseline.md records the results and what they mean for
+optimizing the renderer.
+"""
+
+import argparse
+import cProfile
+import io
+import pstats
+import random
+
+from .svgize import render
+
+
+def random_text(length, docs=1, seed=0):
+    """Reproducible DNA text of about length chars: docs documents, each ending
+    in $, followed by # if there is more than one."""
+    rng = random.Random(seed)
+    doc_len = max(1, length // docs - 1)
+    return ''.join(''.join(rng.choice('acgt') for _ in range(doc_len)) + '$'
+                   for _ in range(docs)) + ('#' if docs > 1 else '')
+
+
+def print_stats(stats, sort, top):
+    """Print the top entries of a pstats.Stats, sorted by the given key."""
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+
+
+def main():
+    """Command-line interface; see the module docstring."""
+    parser = argparse.ArgumentParser(description='Profile bwt-svg rendering')
+    parser.add_argument('text', nargs='?', help='Input text (must end with terminator)')
+    parser.add_argument('--random', type=int, metavar='N',
+                        help='Profile a random DNA text of length N instead')
+    parser.add_argument('--docs', type=int, default=1,
+                        help='Number of documents in the --random text (default: 1)')
+    parser.add_argument('--show-mums', action='store_true', help='Render MUMs')
+    parser.add_argument('--show-thresholds', action='store_true', help='Render thresholds')
+    parser.add_argument('--raster', action='store_true',
+                        help='Use the raster backend (requires Pillow)')
+    parser.add_argument('--sort', default='cumulative',
+                        help='pstats sort key (default: cumulative)')
+    parser.add_argument('--top', type=int, default=20,
+                        help='Number of functions to list (default: 20)')
+    parser.add_argument('--output', '-o', default=None,
+                        help='Also save the raw profile to this file')
+    parser.add_argument('--load', default=None, metavar='PROF',
+                        help='Print a saved profile instead of running one')
+    args = parser.parse_args()
+
+    if args.load:
+        print_stats(pstats.Stats(args.load), args.sort, args.top)
+        return
+    if args.random:
+        t = random_text(args.random, args.docs)
+    elif args.text:
+        t = args.text
+    else:
+        parser.error('give a text or --random N')
+
+    # Render into a discarded buffer, as the CLI streams into a file
+    profiler = cProfile.Profile()
+    profiler.enable()
+    render(t, show_mums=args.show_mums, show_thresholds=args.show_thresholds,
+           out=io.StringIO(), backend="raster" if args.raster else "svg")
+    profiler.disable()
+    if args.output:
+        profiler.dump_stats(args.output)
+    print(f"Text length: {len(t)}")
+    print_stats(pstats.Stats(profiler), args.sort, args.top)
+
+
+if __name__ == '__main__':
+    main()
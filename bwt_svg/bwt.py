@@ -5,95 +5,322 @@ Functionality for building the BWT and various other arrays and functions that
 are useful both in text space (Phi, Phi-inverse, ISA, PLCP, etc) and in lex
 space (SA, LF, LCP, LCS, etc).
 
-No attempt is made to make these methods efficient.  This code is intended to
-be simple and used only for examples that are small enough to be displayed.
+This code is intended to be simple and used mainly for examples that are small
+enough to be displayed.  The suffix array, LCP and LCS arrays are nonetheless
+built with (near) linear-time algorithms (SA-IS, Kasai et al., and Kasai on the
+reversed text plus RMQ) so that construction stays fast for longer inputs.
 
 Author: Ben Langmead
 Date: 10/7/2025
 """
 
+import re
+from array import array
+from collections import deque
+
+_DOC_SEP_RE = re.compile(r'[$#]')
+
+# Single-element lists repeated to fill runs of threshold values
+_SPACE, _DOWN, _UP = [' '], ['v'], ['^']
+
+
+def sa_sais(s, k):
+    """
+    Build suffix array for integer string s over alphabet [0, k) using SA-IS
+    (Nong, Zhang & Chan 2009).  The last element of s must be a unique 0.
+    """
+    n = len(s)
+    if n == 1:
+        return [0]
+    # Classify suffixes as S-type (1) or L-type (0)
+    stype = bytearray(n)
+    stype[n-1] = 1
+    for i in range(n-2, -1, -1):
+        stype[i] = s[i] < s[i+1] or (s[i] == s[i+1] and stype[i+1])
+    is_lms = bytearray(n)
+    lms = []
+    for i in range(1, n):
+        if stype[i] and not stype[i-1]:
+            is_lms[i] = 1
+            lms.append(i)
+    counts = [0] * k
+    for c in s:
+        counts[c] += 1
+
+    def _heads():
+        heads, tot = [0] * k, 0
+        for c in range(k):
+            heads[c] = tot
+            tot += counts[c]
+        return heads
+
+    def _tails():
+        tails, tot = [0] * k, 0
+        for c in range(k):
+            tot += counts[c]
+            tails[c] = tot
+        return tails
+
+    def _induce(lms_order):
+        sa = [-1] * n
+        tails = _tails()
+        for i in reversed(lms_order):
+            c = s[i]
+            tails[c] -= 1
+            sa[tails[c]] = i
+        heads = _heads()
+        for j in range(n):
+            i = sa[j] - 1
+            if i >= 0 and not stype[i]:
+                c = s[i]
+                sa[heads[c]] = i
+                heads[c] += 1
+        tails = _tails()
+        for j in range(n-1, -1, -1):
+            i = sa[j] - 1
+            if i >= 0 and stype[i]:
+                c = s[i]
+                tails[c] -= 1
+                sa[tails[c]] = i
+        return sa
+
+    def _lms_equal(a, b):
+        if a == n-1 or b == n-1:
+            return a == b
+        d = 0
+        while True:
+            if s[a+d] != s[b+d] or stype[a+d] != stype[b+d]:
+                return False
+            if d > 0 and (is_lms[a+d] or is_lms[b+d]):
+                return is_lms[a+d] and is_lms[b+d]
+            d += 1
+
+    # Sort LMS substrings, then name them
+    sa = _induce(lms)
+    names = [-1] * n
+    name, prev = -1, -1
+    for i in sa:
+        if is_lms[i]:
+            if prev < 0 or not _lms_equal(prev, i):
+                name += 1
+            names[i] = name
+            prev = i
+    reduced = [names[i] for i in lms]
+    # Recurse if LMS substring names aren't unique; otherwise invert directly
+    if name + 1 < len(lms):
+        reduced_sa = sa_sais(reduced, name + 1)
+    else:
+        reduced_sa = invert(reduced)
+    return _induce([lms[i] for i in reduced_sa])
+
+
+def sa_prefix_doubling(s):
+    """
+    Build suffix array for s by Manber-Myers-style prefix doubling: sort by
+    (rank, rank k positions later) pairs, doubling k each round.  O(n log^2 n)
+    time and O(n) space.  Much simpler than SA-IS, so it serves as an
+    independent cross-check for sa_sais on inputs too long to sort naively.
+    """
+    n = len(s)
+    sa = list(range(n))
+    rank = list(s)
+    k = 1
+    while True:
+        def key(i):
+            return rank[i], (rank[i+k] if i + k < n else -1)
+        sa.sort(key=key)
+        new_rank = [0] * n
+        for prev, cur in zip(sa, sa[1:]):
+            new_rank[cur] = new_rank[prev] + (key(prev) != key(cur))
+        rank = new_rank
+        if rank[sa[-1]] == n - 1:
+            return sa
+        k *= 2
+
+
+def rank_encode(t):
+    """ Map characters of t to their ranks; returns (ranks, alphabet size) """
+    ranks = {c: i for i, c in enumerate(sorted(set(t)))}
+    return [ranks[c] for c in t], len(ranks)
+
+
 def lf_fl_from_sa_isa(sa, isa):
-    """ Use steps through SA and ISA to derife LF and FL """
-    n = len(sa)
-    assert n == len(isa)
-    lf_pair = list((isa[((sa[i] or n)-1)], i) for i in range(len(sa)))
-    lf = list(map(lambda x: x[0], lf_pair))
-    lf_pair.sort()
-    return lf, list(map(lambda x: x[1], lf_pair))
-
-
-def lcp_from_t_sa(t, sa):
-    """ Typical quadratic-time algorithm with random T access """
-    def _lcp(t, i, j):
-        lcp_len = 0
-        while i + lcp_len < len(t) and \
-              j + lcp_len < len(t) and \
-              t[i+lcp_len] == t[j+lcp_len]:
-            lcp_len += 1
-        return lcp_len
-    lcp_arr = [0]
-    for i in range(1, len(sa)):
-        lcp_arr.append(_lcp(t, sa[i-1], sa[i]))
+    """
+    Use steps through SA and ISA to derive LF and FL.  LF is a permutation
+    and FL is its inverse, so no sorting is needed.
+    """
+    assert len(sa) == len(isa)
+    # LF[i] = ISA[SA[i]-1], cyclically; gather from ISA shifted by one
+    lf = permute(isa[-1:] + isa[:-1], sa)
+    return lf, invert(lf)
+
+
+def lcp_kasai(t, sa, isa):
+    """
+    Kasai et al.'s linear-time algorithm for LCP from T, SA and ISA.  T must
+    end in a unique, smallest sentinel, which stops every match before it
+    runs off the end, so the inner loop needs no bounds checks.
+    """
+    lcp_arr = [0] * len(t)
+    h = 0
+    for i, k in enumerate(isa):
+        if k == 0:
+            h = 0
+            continue
+        j = sa[k-1]
+        while t[i+h] == t[j+h]:
+            h += 1
+        lcp_arr[k] = h
+        if h > 0:
+            h -= 1
     return lcp_arr
 
 
-def lcs_from_bwm(bwm):
-    """ Compute LCS from BWM """
-    def _lcs(s1, s2):
-        lcs_len = 0
-        len_i, len_j = len(s1), len(s2)
-        while (lcs_len < len_i and lcs_len < len_j and
-               s1[len_i - lcs_len - 1] == s2[len_j - lcs_len - 1]):
-            lcs_len += 1
-        return lcs_len
-    lcs_arr = [0]
-    for i in range(1, len(bwm)):
-        lcs_arr.append(_lcs(bwm[i-1], bwm[i]))
+def lcs_from_t_sa(t, sa):
+    """
+    Compute LCS between adjacent BWM rows without materializing the rotations.
+    The LCS of the rotations starting at i and j equals the LCP of the suffixes
+    of reverse(T[:-1]) + T[-1] starting at n-1-i and n-1-j, so we build SA and
+    LCP for the reversed text and answer each query with a sparse-table RMQ.
+    """
+    n = len(t)
+    rev_t = t[-2::-1] + t[-1:]
+    rev_sa = sa_sais(*rank_encode(rev_t))
+    rev_isa = invert(rev_sa)
+    rev_lcp = lcp_kasai(rev_t, rev_sa, rev_isa)
+    # table[j][i] = min(rev_lcp[i : i + 2**j]); the O(n log n) levels are kept
+    # as packed machine ints rather than lists of int objects.  The pairwise
+    # min is an inline comparison, which is several times faster than calling
+    # the min builtin once per element.
+    table = [rev_lcp]
+    span = 1
+    while 2 * span <= n:
+        prev = table[-1]
+        m = len(prev) - span
+        table.append(array('i', [a if a < b else b
+                                 for a, b in zip(prev[:m], prev[span:span+m])]))
+        span *= 2
+    lcs_arr = [0] * n
+    for k in range(1, n):
+        lo, hi = rev_isa[n-1-sa[k-1]], rev_isa[n-1-sa[k]]
+        if lo > hi:
+            lo, hi = hi, lo
+        j = (hi - lo).bit_length() - 1
+        lcs_arr[k] = min(table[j][lo+1], table[j][hi - (1 << j) + 1])
     return lcs_arr
 
 
-def invert(array):
-    """ Invert offsets/values for given array """
-    n = len(array)
+def invert(arr):
+    """ Invert offsets/values for given array arr """
+    n = len(arr)
     inverted = [0] * n
-    for i, s in enumerate(array):
+    for i, s in enumerate(arr):
         inverted[s] = i
     return inverted
 
 
-def permute(array, order):
-    """ Return elements of array in order of order """
-    return [array[order[i]] for i in range(len(array))]
+def permute(arr, order):
+    """ Return elements of arr in order of order """
+    assert len(arr) == len(order)
+    return list(map(arr.__getitem__, order))
 
 
 def thresholds_in_gap(lcps):
     """ Compute up/down/equal jumps according to min LCPs """
-    cum_min_fw, cum_min_bw = [], []
-    thresholds = []
+    k = len(lcps)
+    cum_min_fw = [0] * k
+    fw = None
     for i, lcp in enumerate(lcps):
-        cum_min_fw.append(lcp if i == 0 else min(cum_min_fw[-1], lcp))
-    for i, lcp in enumerate(lcps[::-1]):
-        cum_min_bw.append(lcp if i == 0 else min(cum_min_bw[-1], lcp))
-    for i, (fw, bw) in enumerate(zip(cum_min_fw, cum_min_bw[::-1])):
-        if fw == bw:
-            thresholds.append('=')
-        else:
-            thresholds.append('v' if fw < bw else '^')
-    # Create a run-length-compressed version of thresholds
+        fw = lcp if fw is None or lcp < fw else fw
+        cum_min_fw[i] = fw
+    # Backward pass fills in thresholds and their run-length encoding, which
+    # has at most 3 runs: some v's, then some ='s, then some ^'s
+    thresholds = [None] * k
     rlthresholds = []
-    if thresholds:
-        prev = thresholds[0]
-        count = 1
-        for val in thresholds[1:]:
-            if val == prev:
-                count += 1
-            else:
-                rlthresholds.append((prev, count))
-                prev = val
-                count = 1
-        rlthresholds.append((prev, count))
+    bw = None
+    for i in range(k-1, -1, -1):
+        lcp = lcps[i]
+        bw = lcp if bw is None or lcp < bw else bw
+        fw = cum_min_fw[i]
+        val = '=' if fw == bw else ('v' if fw < bw else '^')
+        thresholds[i] = val
+        if rlthresholds and rlthresholds[-1][0] == val:
+            rlthresholds[-1] = (val, rlthresholds[-1][1] + 1)
+        else:
+            rlthresholds.append((val, 1))
+    rlthresholds.reverse()
     assert len(rlthresholds) <= 3
-    return thresholds[:-1], rlthresholds
+    if thresholds:
+        thresholds.pop()
+    return thresholds, rlthresholds
+
+
+def sliding_min(arr, w):
+    """ Minimum of each length-w window of arr, via a monotonic deque """
+    mins = []
+    window = deque()  # indexes of increasing values; window[0] is the min
+    for i, val in enumerate(arr):
+        while window and arr[window[-1]] >= val:
+            window.pop()
+        window.append(i)
+        if window[0] <= i - w:
+            window.popleft()
+        if i >= w - 1:
+            mins.append(arr[window[0]])
+    return mins
+
+
+class _cached_property:
+    """ Compute attribute on first access, then store it on the instance """
+    # Like functools.cached_property, which needs Python 3.8+
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.func(obj)
+        return value
+
+
+class _BwmView:
+    """ Burrows-Wheeler Matrix rows on demand, without storing all n^2 characters """
+
+    def __init__(self, t, sa):
+        self._td = t + t  # Each rotation is one slice of T+T
+        self._sa = sa
+
+    def __len__(self):
+        return len(self._sa)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        start = self._sa[i]
+        return self._td[start:start + len(self._sa)]
+
+    def __iter__(self):
+        td, n = self._td, len(self._sa)
+        return (td[i:i+n] for i in self._sa)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def column(self, j):
+        """Characters in column j, top to bottom; column 0 is F and n-1 is L."""
+        td = self._td
+        return [td[i + j] for i in self._sa]
 
 
 class BwtSuite:
@@ -101,99 +328,133 @@ class BwtSuite:
 
     def __init__(self, t):
         """Compute all BWT-related arrays for text t."""
-        assert t[-1] < min(t[:-1])
         self.t = t
-        self.n = n = len(t)
+        self.n = len(t)
+        # T as character ranks (sentinel is 0); bytes unless alphabet is huge
+        ranks, self.sigma = rank_encode(t)
+        self.t_ranks = bytes(ranks) if self.sigma <= 256 else ranks
+        # Terminator must be the unique smallest character, i.e. the only 0
+        assert ranks[-1] == 0 and self.t_ranks.count(0) == 1
         self.sa = self._compute_sa()
         self.isa = invert(self.sa)
         self.da, self.num_docs = self._compute_da()
         self.alphabet = list(sorted(set(t)))
-        self.bwm, self.bwt = self._compute_bwm_and_bwt()
-        self.lcp = lcp_from_t_sa(t, self.sa)
-        self.lcs = lcs_from_bwm(self.bwm)
+        self.bwt = self._compute_bwt()
+        self.lcp = lcp_kasai(self.t_ranks, self.sa, self.isa)
         self.plcp = permute(self.lcp, self.isa)
-        self.plcs = permute(self.lcs, self.isa)
         self.lf, self.fl = lf_fl_from_sa_isa(self.sa, self.isa)
-        self.phi = list(self.sa[((self.isa[i] or n)-1)] for i in range(n))
-        self.phiinv = list(
-            self.sa[(-1 if (self.isa[i] == n-1) else self.isa[i]) + 1] for i in range(n)
-        )
-        self.thresholds = self._compute_thresholds()
+        # Phi(i) = SA[ISA[i]-1] and Phi^-1(i) = SA[ISA[i]+1], cyclically
+        self.phi = permute(self.sa[-1:] + self.sa[:-1], self.isa)
+        self.phiinv = permute(self.sa[1:] + self.sa[:1], self.isa)
 
     def _compute_sa(self):
-        """Compute suffix array."""
-        satups = sorted([(self.t[i:], i) for i in range(self.n)])
-        return list(map(lambda x: x[1], satups))
+        """Compute suffix array with SA-IS over the ranks of T's characters."""
+        return sa_sais(self.t_ranks, self.sigma)
 
-    def _compute_thresholds(self):
+    @_cached_property
+    def thresholds(self):
+        """
+        Threshold array for each character, built on first access.  Positions
+        in a run of c get ' ', positions before the first run get 'v',
+        positions after the last run get '^', and gaps between runs are filled
+        according to the LCPs in the gap.
+        """
+        # One pass over the BWT to find the runs of each character
+        runs = {c: [] for c in self.alphabet}
+        bwt, n = self.bwt, self.n
+        start = 0
+        for i in range(1, n + 1):
+            if i == n or bwt[i] != bwt[start]:
+                runs[bwt[start]].append((start, i))
+                start = i
+        lcp = self.lcp
         thresholds = {}
-        for c in self.alphabet:
-            thresholds[c] = []
-            before_first_c_run = True
-            in_c_run = False
-            lcps = []
-            for i, bwtc in enumerate(self.bwt):
-                if before_first_c_run:
-                    if bwtc == c:
-                        in_c_run = True
-                        before_first_c_run = False
-                        thresholds[c].append(' ')
-                    else:
-                        thresholds[c].append('v')
-                    continue
-                if in_c_run:
-                    if bwtc != c:
-                        in_c_run = False
-                        lcps = [self.lcp[i]]
-                    else:
-                        thresholds[c].append(' ')
+        for c, c_runs in runs.items():
+            first_start, prev_end = c_runs[0]
+            thresh = _DOWN * first_start + _SPACE * (prev_end - first_start)
+            for run_start, run_end in c_runs[1:]:
+                if run_start - prev_end == 1:
+                    # Single-row gap: compare its LCP with the next run's
+                    thresh.append('=' if lcp[prev_end] <= lcp[run_start] else '^')
                 else:
-                    if bwtc == c:
-                        in_c_run = True
-                        lcps.append(self.lcp[i])
-                        thresh, _ = thresholds_in_gap(lcps)
-                        thresholds[c].extend(thresh)
-                        thresholds[c].append(' ')
-                        lcps = []
-                    else:
-                        lcps.append(self.lcp[i])
-            for _ in range(len(lcps)):
-                thresholds[c].append('^')
+                    gap, _ = thresholds_in_gap(lcp[prev_end:run_start+1])
+                    thresh.extend(gap)
+                thresh.extend(_SPACE * (run_end - run_start))
+                prev_end = run_end
+            thresh.extend(_UP * (n - prev_end))
+            thresholds[c] = thresh
         return thresholds
 
+    @_cached_property
+    def bwm(self):
+        """Burrows-Wheeler Matrix as a sequence of rows, each built when accessed."""
+        return _BwmView(self.t, self.sa)
+
+    @_cached_property
+    def lcs(self):
+        """LCS array, built on first access; decoupled from the BWM."""
+        return lcs_from_t_sa(self.t_ranks, self.sa)
 
-    def _compute_bwm_and_bwt(self):
-        """Compute Burrows-Wheeler Matrix and BWT (last column of BWM)."""
-        bwm, bwt_chars = [], []
-        for i in self.sa:
-            row = self.t[i:] + self.t[:i]
-            bwm.append(row)
-            bwt_chars.append(row[-1])
-        return bwm, ''.join(bwt_chars)
+    @_cached_property
+    def plcs(self):
+        """Permuted LCS array, built on first access."""
+        return permute(self.lcs, self.isa)
+
+    def _compute_bwt(self):
+        """Compute BWT (last column of BWM) directly from the SA."""
+        t = self.t
+        return ''.join([t[i-1] for i in self.sa])
 
     def _compute_da(self):
-        """Compute DA array."""
-        da = [0] * len(self.t)
-        doc_id = 0
-        for i, char in enumerate(self.t):
-            if char in ('$', '#'):
-                da[self.isa[i]] = doc_id
-                doc_id += 1
-            else:
-                da[self.isa[i]] = doc_id
-        return da, doc_id
+        """Compute DA array; each '$' or '#' ends a document."""
+        # Label text positions one document at a time, then gather by SA
+        doc_of_pos = []
+        start = doc_id = 0
+        for sep in _DOC_SEP_RE.finditer(self.t):
+            end = sep.end()
+            doc_of_pos.extend([doc_id] * (end - start))
+            start = end
+            doc_id += 1
+        doc_of_pos.extend([doc_id] * (self.n - start))
+        return permute(doc_of_pos, self.sa), doc_id
 
     def find_mums(self):
         """
         Find maximal unique matches (assuming $ separator between sequences)
         Returns a list of tuples (start, end) of ranges in the SA that are MUMs
         """
+        return list(self.mums)
+
+    @_cached_property
+    def mums(self):
+        """MUM intervals, found on first access; see find_mums."""
+        d = self.num_docs
+        if d < 2:
+            return []
+        lcp, bwt, da = self.lcp, self.bwt, self.da
+        # Count how many distinct documents the window da[i:i+d] covers,
+        # updating the counts as the window slides instead of building sets.
+        # Text after the last separator is document d, so labels run to d
+        counts = [0] * (d + 1)
+        distinct = 0
+        for doc in da[:d]:
+            if counts[doc] == 0:
+                distinct += 1
+            counts[doc] += 1
+        # win_min[i+1] = min(lcp[i+1 : i+d])
+        win_min = sliding_min(lcp, d - 1)
         mums = []
-        for i in range(self.n - self.num_docs):
-            lcp = min(self.lcp[i + 1 : i + self.num_docs])
-            lcp_interval = lcp > self.lcp[i] and lcp > self.lcp[i + self.num_docs]
-            bwt_distinct = len(set(self.bwt[i : i + self.num_docs])) != 1
-            da_distinct = len(set(self.da[i : i + self.num_docs])) == self.num_docs
-            if lcp_interval and bwt_distinct and da_distinct:
-                mums.append((i, i + self.num_docs))
+        for i in range(self.n - d):
+            if distinct == d and bwt.count(bwt[i], i, i + d) != d:
+                lcp_min = win_min[i + 1]
+                if lcp_min > lcp[i] and lcp_min > lcp[i + d]:
+                    mums.append((i, i + d))
+            doc = da[i]
+            counts[doc] -= 1
+            if counts[doc] == 0:
+                distinct -= 1
+            doc = da[i + d]
+            if counts[doc] == 0:
+                distinct += 1
+            counts[doc] += 1
         return mums
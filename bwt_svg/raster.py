@@ -0,0 +1,104 @@
+"""
+Raster backend for the Burrows-Wheeler matrix body.
+
+For long inputs the BWM contributes O(n^2) text and rect elements, which
+dominates SVG file size and makes editors and browsers slow to load the
+result.  BwmRaster draws those cells and highlight rectangles into a single
+PNG that render() embeds as one <image>, leaving labels and the other arrays
+as vector elements.
+
+Requires Pillow, which is otherwise not a dependency of this package.
+"""
+
+import base64
+import io
+import math
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # pragma: no cover - exercised only without Pillow
+    Image = None
+
+# Fill and outline colors for each rect class drawn here, with the class's
+# opacity as the alpha channel; these mirror the stylesheet in svgize.py
+_RECT_STYLES = {
+    'blue-highlight': ((0xc3, 0xd9, 0xff, 128), None),
+    'blue-outline': (None, (0x00, 0x00, 0x66, 128)),
+    'red-highlight': ((0xff, 0xc3, 0xc3, 128), None),
+    'red-outline': (None, (0x66, 0x00, 0x00, 128)),
+}
+
+_FONT_SIZE = 18  # font-size of the .monospace class
+_FALLBACK_FONTS = ['DejaVuSansMono.ttf', 'Courier New.ttf', 'cour.ttf']
+
+
+def _load_font(family):
+    """Find a TrueType font for family, falling back to common monospace fonts."""
+    for name in [family, f'{family}.ttf'] + _FALLBACK_FONTS:
+        try:
+            return ImageFont.truetype(name, _FONT_SIZE)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=_FONT_SIZE)  # Pillow 10.1+
+    except TypeError:
+        return ImageFont.load_default()
+
+
+class BwmRaster:
+    """Canvas covering the BWM; draw cells and rects, then emit an <image>."""
+
+    def __init__(self, x0, y0, x1, y1, monospace_font):
+        if Image is None:
+            raise ImportError(
+                "The raster backend requires Pillow; install it with "
+                "'pip install bwt-svg[raster]'")
+        self.x0, self.y0 = math.floor(x0), math.floor(y0)
+        self.width = math.ceil(x1) - self.x0
+        self.height = math.ceil(y1) - self.y0
+        self.img = Image.new('RGBA', (self.width, self.height), (0, 0, 0, 0))
+        self.font = _load_font(monospace_font)
+        self.glyphs = {}
+        # Rects go on their own layer, composited over the text at the end.
+        # Overlapping rects replace rather than blend with each other.
+        self.rects = Image.new('RGBA', (self.width, self.height), (0, 0, 0, 0))
+        self.rects_draw = ImageDraw.Draw(self.rects)
+
+    def _glyph(self, char, fill):
+        """Tile with char drawn in fill, plus the tile's offset from the baseline."""
+        key = (char, fill)
+        if key not in self.glyphs:
+            left, top, right, bottom = self.font.getbbox(char, anchor='ls')
+            tile = Image.new('RGBA', (max(right - left, 1), max(bottom - top, 1)),
+                             (0, 0, 0, 0))
+            ImageDraw.Draw(tile).text((-left, -top), char, fill=fill,
+                                      font=self.font, anchor='ls')
+            self.glyphs[key] = (tile, left, top)
+        return self.glyphs[key]
+
+    def text(self, x, y, char, fill):
+        """Draw char with its baseline starting at (x, y), like SVG <text>."""
+        tile, left, top = self._glyph(char, fill)
+        # Cells never overlap, so a plain paste onto the transparent canvas
+        # gives the same result as compositing
+        self.img.paste(tile, (round(x) - self.x0 + left, round(y) - self.y0 + top))
+
+    def rect(self, x, y, width, height, class_name):
+        """Draw a rect styled like the given stylesheet class."""
+        fill, outline = _RECT_STYLES[class_name]
+        # ImageDraw boxes include their end pixel; SVG rects stop short of it
+        box = [x - self.x0, y - self.y0,
+               x - self.x0 + width - 1, y - self.y0 + height - 1]
+        self.rects_draw.rectangle(box, fill=fill, outline=outline,
+                                  width=2 if outline else 0)
+
+    def to_svg(self):
+        """Composite the rects over the text; return an <image> embedding the PNG."""
+        img = Image.alpha_composite(self.img, self.rects)
+        buf = io.BytesIO()
+        img.save(buf, format='PNG')
+        data = base64.b64encode(buf.getvalue()).decode('ascii')
+        return (f'    <image x="{self.x0}" y="{self.y0}" width="{self.width}" '
+                f'height="{self.height}" '
+                f'xmlns:xlink="http://www.w3.org/1999/xlink" '
+                f'xlink:href="data:image/png;base64,{data}"/>\n')
@@ -40,18 +40,211 @@ Date: 10/7/2025
 """
 
 import argparse
-from contextlib import contextmanager
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from functools import lru_cache
+from itertools import chain, groupby
+from operator import sub
 from .bwt import BwtSuite
 
 
-@contextmanager
-def svg_group(content, transform=None, **attrs):
-    """Context manager for SVG groups to reduce boilerplate."""
-    attrs_str = ' '.join(f'{k}="{v}"' for k, v in attrs.items())
-    transform_str = f' transform="{transform}"' if transform else ''
-    content.append(f'  <g{transform_str} {attrs_str}>\n')
-    yield
-    content.append('  </g>\n')
+# Templates for the text and rect elements that make up most of the output
+_TEXT_LABEL = '    <text x="%s" y="%s" class="label" text-anchor="end">%s</text>\n'
+_TEXT_MONO = '    <text x="%s" y="%s" class="monospace" fill="%s">%s</text>\n'
+_TEXT_PLAIN = '    <text x="%s" y="%s" class="monospace">%s</text>\n'
+_RECT = '    <rect x="%s" y="%s" width="%s" height="%s" class="%s"/>\n'
+_PATH = '    <path d="%s" class="%s"/>\n'
+_TSPAN = '<tspan x="%s" y="%s">%s</tspan>'
+
+# Threshold directions drawn as arrows; '=' and ' ' are drawn as themselves
+_THRESHOLD_ARROWS = str.maketrans({'^': '↑', 'v': '↓'})
+
+# Shading for stretches of each threshold direction; blank stretches are unshaded
+_THRESHOLD_SHADES = {
+    '=': "medgray-highlight",    # Medium gray
+    '^': "lightgray-highlight",  # Light gray
+    'v': "lightgray-highlight",  # Light gray
+}
+
+
+# Fixed part of the SVG header; the stylesheet is filled in by _svg_css
+_SVG_HEADER_TMPL = '''<?xml version="1.0" encoding="UTF-8"?>
+            <svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">
+            {rect}  <defs>
+{css}            </defs>
+            '''
+
+_SVG_CSS_TMPL = '''                <style>
+                .monospace {{ font-family: '{monospace_font}', monospace; font-size: 18px; }}
+                .label {{ font-family: '{label_font}', sans-serif; font-size: 16px; font-weight: bold; }}
+                .f-column {{ fill: #e6e6e6; stroke: none; }}
+                .l-column {{ fill: #e6e6e6; stroke: none; }}
+                .blue-highlight {{ fill: {lcp_highlight}; stroke: none; opacity: {lcp_opacity}; }}
+                .blue-outline {{ fill: none; stroke: #000066; stroke-width: 2; opacity: {lcp_opacity}; }}
+                .red-highlight {{ fill: {lcs_highlight}; stroke: none; opacity: {lcs_opacity}; }}
+                .green-highlight {{ fill: #c3ffc3; stroke: none; opacity: 0.5; }}
+                .red-outline {{ fill: none; stroke: #660000; stroke-width: 2; opacity: {lcs_opacity}; }}
+                .plum-highlight {{ fill: #f0e6f0; stroke: #8b008b; stroke-width: 1; opacity: 0.6; }}
+                .teal-highlight {{ fill: #d3f3f9; stroke: #006666; stroke-width: 1; opacity: 0.6; }}
+                .medgray-highlight {{ fill: #e0e0e0; stroke: none; }}
+                .lightgray-highlight {{ fill: #f0f0f0; stroke: none; }}
+                .bwt-separator {{ stroke: #666; stroke-width: 1; fill: none; }}
+                .arrow {{ stroke: #333; stroke-width: 2; fill: none; }}
+                .arrow-label {{ font-family: 'Courier New', monospace; font-size: 14px; font-weight: bold; }}
+                </style>
+'''
+
+
+@lru_cache(maxsize=32)
+def _svg_css(monospace_font, label_font,
+             lcp_highlight="#c3d9ff", lcs_highlight="#ffc3c3",
+             lcp_opacity="0.5", lcs_opacity="0.5"):
+    """Stylesheet for the diagram; depends only on the fonts and colors."""
+    return _SVG_CSS_TMPL.format(
+        monospace_font=monospace_font, label_font=label_font,
+        lcp_highlight=lcp_highlight, lcs_highlight=lcs_highlight,
+        lcp_opacity=lcp_opacity, lcs_opacity=lcs_opacity)
+
+
+def _fill_all(tmpl, coords, vals):
+    """Fill a two-field template once per (coord, val) pair and concatenate."""
+    # One % over the repeated template formats the whole row or column in a
+    # single call, instead of one call per element
+    n = min(len(coords), len(vals))
+    return (tmpl * n) % tuple(chain.from_iterable(zip(coords, vals)))
+
+
+def _f(v):
+    """Format a coordinate with at most two decimals and no trailing zeros."""
+    # Cell coordinates are whole pixels already; this is for everything else,
+    # where e.g. 123.0 would otherwise be written out in full
+    return ('%.2f' % v).rstrip('0').rstrip('.')
+
+
+def _rect(x, y, width, height, class_name):
+    """A <rect> element of the given class."""
+    return _RECT % (_f(x), _f(y), _f(width), _f(height), class_name)
+
+
+def _text_column(x, ys, vals):
+    """Label-class values down a column at x, as one <text> element."""
+    # Every value is a tspan with its own absolute position.  Blank values are
+    # left out: SVG collapses whitespace-only text, and relative dy offsets
+    # carried by a collapsed tspan would be lost along with it
+    cells = [(y, v) for y, v in zip(ys, vals) if v != ' ']
+    if not cells:
+        return ''
+    tspans = _fill_all(_TSPAN % (x, '%s', '%s'), *zip(*cells))
+    return _TEXT_LABEL % (x, cells[0][0], tspans)
+
+
+@lru_cache(maxsize=64)
+def _coords(base, offset, step, count):
+    """Rounded coordinates base + (i+offset)*step for i in range(count)."""
+    # Layout depends only on the text length and options, so repeated renders
+    # of same-length texts reuse these tables rather than recomputing them
+    return tuple([round(base + (i+offset) * step) for i in range(count)])
+
+
+@lru_cache(maxsize=16)
+def _bwm_columns(bwm_start_x, ch_wd, narrow_wd, num_cols):
+    """x coordinates of the BWM columns, with a (blue, red, black) template for each."""
+    # The first (F) column is a full character wide, the rest are narrow
+    col_xs = tuple([round(bwm_start_x + (0 if j == 0 else ch_wd + (j-1) * narrow_wd))
+                    for j in range(num_cols)])
+    # Only y and character vary down a column, so each color gets its own
+    # template with x and the color already filled in
+    tmpls = tuple([tuple([_TEXT_MONO % (x, '%s', color, '%s')
+                          for color in ('blue', 'red', 'black')])
+                   for x in col_xs])
+    return col_xs, tmpls
+
+
+# Bump when BwtSuite's attributes change, so stale cache files are ignored
+_SUITE_CACHE_FORMAT = 2
+
+
+def default_cache_dir():
+    """Directory for cached BwtSuites: $XDG_CACHE_HOME/bwt-svg or ~/.cache/bwt-svg."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'bwt-svg')
+
+
+def _load_suite(t, cache_dir):
+    """BwtSuite for t, read from cache_dir if saved there, else built and saved."""
+    key = hashlib.blake2b(f'{_SUITE_CACHE_FORMAT}\0{t}'.encode('utf-8'),
+                          digest_size=16).hexdigest()
+    path = os.path.join(cache_dir, key + '.pkl')
+    try:
+        with open(path, 'rb') as f:
+            suite = pickle.load(f)
+        if isinstance(suite, BwtSuite) and suite.t == t:
+            return suite
+    except Exception:
+        pass  # Missing, unreadable or stale; rebuild it
+    suite = BwtSuite(t)
+    # Build the lazily computed arrays now, so they are saved too; the BWM
+    # view is left out, as it is cheap and would pickle a second copy of t.
+    # If one fails, the render may not need it, so return the suite unsaved
+    try:
+        for name in ('lcs', 'plcs', 'thresholds', 'mums'):
+            getattr(suite, name)
+    except Exception:
+        return suite
+    # Write to a temporary name first so readers never see a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(suite, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Caching is best-effort, but don't leave a partial file behind
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return suite
+
+
+@lru_cache(maxsize=8)
+def _get_suite(t, cache_dir=None):
+    """BwtSuite for t, reused when the same text is rendered repeatedly.
+
+    With a cache_dir, suites are also kept on disk, so they survive across
+    separate invocations."""
+    if cache_dir is not None:
+        return _load_suite(t, cache_dir)
+    return BwtSuite(t)
+
+
+def _g_open(content, gid, flatten=False):
+    """Open an SVG group; pair with _g_close, passing the same flatten."""
+    # A flattened group is omitted entirely; its elements join the enclosing
+    # group.  Groups here carry no transform or style, so nothing is lost
+    # visually, only the editor layer.
+    if not flatten:
+        content.append(f'  <g id="{gid}">\n')
+
+
+def _g_close(content, flatten=False):
+    """Close the SVG group most recently opened with _g_open."""
+    if not flatten:
+        content.append('  </g>\n')
+
+
+def _runs_of_step(arr, direction=1):
+    """Return (start, length) of maximal runs of 2+ values stepping by direction."""
+    # Runs are delimited by the positions where the step is broken; the
+    # differences come from one C-level map rather than per-element indexing
+    bounds = [0]
+    bounds += [i for i, step in enumerate(map(sub, arr[1:], arr), 1) if step != direction]
+    bounds.append(len(arr))
+    return [(start, end - start) for start, end in zip(bounds, bounds[1:]) if end - start >= 2]
 
 
 def render(t,
@@ -61,13 +254,37 @@ def render(t,
            label_font="Times",
            background_color=None,
            show_thresholds=False,
-           guidelines=False):
-    """ Make SVG out of all the BWT structures """
+           guidelines=False,
+           out=None,
+           backend="svg",
+           editor_mode=False,
+           cache_dir=None):
+    """ Make SVG out of all the BWT structures
+
+    Returns the SVG as a string.  If out is a writable text file, the SVG is
+    instead written to it one section at a time, so the whole document is
+    never held in memory, and None is returned.
+
+    With backend="raster", the BWM cells and the LCP/LCS rectangles over them
+    are drawn into one embedded PNG instead of individual elements, which
+    keeps files for long inputs small.  This requires Pillow.
+
+    Each structure gets its own top-level group.  The groups nested inside
+    those (e.g. separate values and rectangles, or one per BWM column) are
+    only emitted with editor_mode=True, for hiding and showing them as
+    layers in a graphics editor.  Leaving them out shrinks the file and the
+    DOM without changing the picture.
+
+    If cache_dir is given, the BWT arrays for t are saved there and loaded
+    on later calls with the same text (see default_cache_dir).
+    """
 
     assert which in ["horizontal", "vertical", "both"]
+    assert backend in ["svg", "raster"]
+    flat = not editor_mode  # Whether to flatten nested groups
 
-    # Create BwtSuite to compute all arrays
-    suite = BwtSuite(t)
+    # Create (or reuse) BwtSuite to compute all arrays
+    suite = _get_suite(t, cache_dir)
     if show_mums:
         mums = suite.find_mums()
     else:
@@ -87,9 +304,11 @@ def render(t,
     fl = suite.fl
     if show_mums:
         da = suite.da  # Only extract DA when showing MUMs
-    off = list(range(len(t)))
-    rank = list(range(len(mysa)))
-    thresholds = suite.thresholds
+    off = range(len(t))
+    rank = range(len(mysa))
+    thresholds = suite.thresholds if show_thresholds else None
+    alphabet = suite.alphabet
+    alphabet_size = len(alphabet)
 
     # === LAYOUT CONSTANTS ===
     n = len(t)
@@ -102,47 +321,38 @@ def render(t,
     threshold_shift = 25 if show_thresholds else 0
 
     # BWM section positions
-    t_right_edge = 2*padding + label_offset + label_shift + len(t) * ch_wd
+    t_right_edge = 2*padding + label_offset + label_shift + n * ch_wd
     bwm_narrow_col_wd = 13
 
     # IF YOU ADD A NEW ELEMENT to the diagram, please include its contribution
     # here.  This allows us to size the overall image correctly.
-    vertical_contributions = [
-        {
-            't': ch_ht, 'off': ch_ht, 'isa': ch_ht,
-            'phi': ch_ht, 'phiinv': ch_ht, 'plcp': ch_ht,
-            'plcs': ch_ht, 'extra': ch_ht
-        },
-        {
-            'bwm_total': ch_ht * (len(t) + 3)
-        }
-    ]
-
-    horizontal_contributions = [
-        {
-            't_total': t_right_edge + 15 + ch_wd + space
-        },
-        {
-            'da': ch_wd if show_mums else 0,
-            'sa': ch_wd,
-            'lf': 1.5 * ch_wd,
-            'lcs': 1.5 * ch_wd,
-            'l': ch_wd * 1.8,
-            'bwm': bwm_narrow_col_wd * (len(t) - 2),
-            'f': ch_wd * 1.8,
-            'lcp': ch_wd * 1.5,
-            'fl': ch_wd * 1.5,
-            'rank': ch_wd * 1.5,
-            'thresholds': (ch_wd * len(suite.alphabet)) if show_thresholds else 0,
-            'extra': padding
-        }
-    ]
-
-    top_height = sum(x for x in vertical_contributions[0].values())
-    bottom_height = sum(x for x in vertical_contributions[1].values())
-
-    top_width = sum(x for x in horizontal_contributions[0].values())
-    bottom_width = sum(x for x in horizontal_contributions[1].values())
+    top_height = (
+        ch_ht +  # t
+        ch_ht +  # off
+        ch_ht +  # isa
+        ch_ht +  # phi
+        ch_ht +  # phiinv
+        ch_ht +  # plcp
+        ch_ht +  # plcs
+        ch_ht    # extra
+    )
+    bottom_height = ch_ht * (n + 3)  # bwm_total
+
+    top_width = t_right_edge + 15 + ch_wd + space  # t_total
+    bottom_width = (
+        (ch_wd if show_mums else 0) +                     # da
+        ch_wd +                                           # sa
+        1.5 * ch_wd +                                     # lf
+        1.5 * ch_wd +                                     # lcs
+        ch_wd * 1.8 +                                     # l
+        bwm_narrow_col_wd * (n - 2) +                     # bwm
+        ch_wd * 1.8 +                                     # f
+        ch_wd * 1.5 +                                     # lcp
+        ch_wd * 1.5 +                                     # fl
+        ch_wd * 1.5 +                                     # rank
+        ((ch_wd * alphabet_size) if show_thresholds else 0) +  # thresholds
+        padding                                           # extra
+    )
 
     overall_width, overall_height = 0, 0
     if which == "both":
@@ -156,10 +366,6 @@ def render(t,
         overall_height = bottom_height
 
     def _svg_header():
-        lcp_highlight = "#c3d9ff"
-        lcs_highlight = "#ffc3c3"
-        lcp_opacity = lcs_opacity = "0.5"
-
         # To set total width, we need to measure both the width of the
         # horizontally oriented top part (T and friends), but also the width of
         # the vertically oriented part (BWM, F, L and friends).
@@ -169,69 +375,42 @@ def render(t,
         rect_tag = ""
         if background_color is not None:
             rect_tag = (
-                f'  <rect width="{overall_width}" height="{overall_height}" '
+                f'  <rect width="{_f(overall_width)}" height="{_f(overall_height)}" '
                 f'fill="{background_color}"/>\n'
             )
 
-        return f'''<?xml version="1.0" encoding="UTF-8"?>
-            <svg width="{overall_width}" height="{overall_height}" xmlns="http://www.w3.org/2000/svg">
-            {rect_tag}  <defs>
-                <style>
-                .monospace {{ font-family: '{monospace_font}', monospace; font-size: 18px; }}
-                .label {{ font-family: '{label_font}', sans-serif; font-size: 16px; font-weight: bold; }}
-                .f-column {{ fill: #e6e6e6; stroke: none; }}
-                .l-column {{ fill: #e6e6e6; stroke: none; }}
-                .blue-highlight {{ fill: {lcp_highlight}; stroke: none; opacity: {lcp_opacity}; }}
-                .blue-outline {{ fill: none; stroke: #000066; stroke-width: 2; opacity: {lcp_opacity}; }}
-                .red-highlight {{ fill: {lcs_highlight}; stroke: none; opacity: {lcs_opacity}; }}
-                .green-highlight {{ fill: #c3ffc3; stroke: none; opacity: 0.5; }}
-                .red-outline {{ fill: none; stroke: #660000; stroke-width: 2; opacity: {lcs_opacity}; }}
-                .plum-highlight {{ fill: #f0e6f0; stroke: #8b008b; stroke-width: 1; opacity: 0.6; }}
-                .teal-highlight {{ fill: #d3f3f9; stroke: #006666; stroke-width: 1; opacity: 0.6; }}
-                .medgray-highlight {{ fill: #e0e0e0; stroke: none; }}
-                .lightgray-highlight {{ fill: #f0f0f0; stroke: none; }}
-                .bwt-separator {{ stroke: #666; stroke-width: 1; fill: none; }}
-                .arrow {{ stroke: #333; stroke-width: 2; fill: none; }}
-                .arrow-label {{ font-family: 'Courier New', monospace; font-size: 14px; font-weight: bold; }}
-                </style>
-            </defs>
-            '''
+        return _SVG_HEADER_TMPL.format(
+            width=_f(overall_width), height=_f(overall_height), rect=rect_tag,
+            css=_svg_css(monospace_font, label_font))
+
+    parts = [_svg_header()]
 
-    svg_content = _svg_header()
+    def _flush():
+        # Hand finished sections to the output file, if streaming
+        if out is not None:
+            out.write(''.join(parts))
+            parts.clear()
 
     if which == "both" and guidelines:
         # Draw a horizontal guideline at 'top_height' from the top across the
         # full width of the image (thicker)
-        svg_content += (
-            f'  <line x1="0" y1="{top_height}" x2="{overall_width}" y2="{top_height}" '
+        parts.append(
+            f'  <line x1="0" y1="{_f(top_height)}" x2="{_f(overall_width)}" y2="{_f(top_height)}" '
             f'style="stroke:#bbb;stroke-width:3;stroke-dasharray:4,4"/>\n'
         )
         # Draw a vertical guideline at 'top_width' from the left across the
         # full height of the image (thicker)
-        svg_content += (
-            f'  <line x1="{top_width}" y1="0" x2="{top_width}" y2="{overall_height}" '
+        parts.append(
+            f'  <line x1="{_f(top_width)}" y1="0" x2="{_f(top_width)}" y2="{_f(overall_height)}" '
             f'style="stroke:#bbb;stroke-width:3;stroke-dasharray:4,4"/>\n'
         )
         # Draw a vertical *blue* guideline at 'bottom_width' from the left across
         # the full height of the image (thicker and blue)
-        svg_content += (
-            f'  <line x1="{bottom_width}" y1="0" x2="{bottom_width}" y2="{overall_height}" '
+        parts.append(
+            f'  <line x1="{_f(bottom_width)}" y1="0" x2="{_f(bottom_width)}" y2="{_f(overall_height)}" '
             f'style="stroke:#38f;stroke-width:3;stroke-dasharray:4,4"/>\n'
         )
 
-    mono = 'class="monospace"'
-    anc_end = 'text-anchor="end"'
-    lab = 'class="label"'
-
-    def _text(x, y, lab, anc, content, spaces=4):
-        sp = ' ' * spaces
-        return f'{sp}<text x="{x}" y="{y}" {lab} {anc}>{content}</text>\n'
-
-    def _rect(x, y, width, height, class_name, spaces=4):
-        sp = ' ' * spaces
-        return (f'{sp}<rect x="{x}" y="{y}" width="{width}" '
-                f'height="{height}" class="{class_name}"/>\n')
-
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     #
     # HORIZONTAL ELEMENTS
@@ -241,178 +420,143 @@ def render(t,
     horizontal_label_rhs = 2 * padding
     from_top = 1
 
+    # Every row places its values at the same x coordinates.  Per-cell
+    # coordinates are rounded to whole pixels throughout; sub-pixel precision
+    # only lengthens the file.
+    row_val_xs = _coords(horizontal_label_rhs, 0.5, ch_wd, n)
+
+    # Helper function to draw a row label followed by one value per offset
+    def _emit_horiz_row(arr, y, label, label_wd):
+        parts.append(_TEXT_LABEL % (_f(horizontal_label_rhs - label_wd), y, label))
+        tmpl = _TEXT_LABEL % ('%s', y, '%s')
+        parts.append(_fill_all(tmpl, row_val_xs, arr))
+
     if which in ["horizontal", "both"]:
         #
         # T
         #
-        t_group = []
-        with svg_group(t_group, id="T"):
-            label_wd = ch_wd  # width of "T" label as multiple of char width
-            x = horizontal_label_rhs - label_wd
-            t_group.append(_text(x, from_top * ch_ht, lab, anc_end, 'T'))
-            for i, char in enumerate(t):
-                x = horizontal_label_rhs + (i+0.2) * ch_wd
-                t_group.append(_text(x, from_top * ch_ht, mono, '', char))
-        svg_content += ''.join(t_group)
+        _g_open(parts, "T")
+        label_wd = ch_wd  # width of "T" label as multiple of char width
+        x = horizontal_label_rhs - label_wd
+        parts.append(_TEXT_LABEL % (_f(x), from_top * ch_ht, 'T'))
+        tmpl = _TEXT_PLAIN % ('%s', from_top * ch_ht, '%s')
+        parts.append(_fill_all(tmpl, _coords(horizontal_label_rhs, 0.2, ch_wd, n), t))
+        _g_close(parts)
         from_top += 1
 
         #
         # Offsets
         #
-        off_group = []
-        with svg_group(off_group, id="Offset"):
-            label_wd = 1.1 * ch_wd  # width of "Offset" label as multiple of char width
-            x = horizontal_label_rhs - label_wd
-            off_group.append(_text(x, from_top * ch_ht, lab, anc_end, 'Off'))
-            for i, off_val in enumerate(off):
-                x = horizontal_label_rhs + (i+0.5) * ch_wd
-                off_group.append(_text(x, from_top * ch_ht, lab, anc_end, off_val))
-        svg_content += ''.join(off_group)
+        _g_open(parts, "Offset")
+        label_wd = 1.1 * ch_wd  # width of "Offset" label as multiple of char width
+        _emit_horiz_row(off, from_top * ch_ht, 'Off', label_wd)
+        _g_close(parts)
         from_top += 1
 
         #
         # ISA
         #
-        isa_group = []
-        with svg_group(isa_group, id="ISA"):
-            label_wd = 1 * ch_wd  # width of "ISA" label as multiple of char width
-            x = horizontal_label_rhs - label_wd
-            isa_group.append(_text(x, from_top * ch_ht, lab, anc_end, 'ISA'))
-            for i, isa_val in enumerate(isa):
-                x = horizontal_label_rhs + (i+0.5) * ch_wd
-                isa_group.append(_text(x, from_top * ch_ht, lab, anc_end, isa_val))
-        svg_content += ''.join(isa_group)
+        _g_open(parts, "ISA")
+        label_wd = 1 * ch_wd  # width of "ISA" label as multiple of char width
+        _emit_horiz_row(isa, from_top * ch_ht, 'ISA', label_wd)
+        _g_close(parts)
         from_top += 1
 
         # Helper function to draw highlighting rectangles for maximal intervals
         def _draw_horiz_highlight_rects(
-            group, arr, x, y, 
+            arr, x, y, 
             direction=1,  # +1 for ascending, -1 for descending
             class_name="plum-highlight"
         ):
-            i = 0
             rect_x_off = 8
             ht_wd_addend = -5
-            while i < len(arr):
-                if i == 0 or arr[i] != arr[i-1] + direction:
-                    start_i = i
-                    while i + 1 < len(arr) and arr[i+1] == arr[i] + direction:
-                        i += 1
-                    if i - start_i + 1 >= 2:
-                        rect_x = x + (start_i-1) * ch_wd + rect_x_off
-                        rect_y = y - (ch_ht  * 0.6)
-                        rect_ht = ch_ht + ht_wd_addend
-                        rect_wd = (i - start_i + 1) * ch_wd + ht_wd_addend
-                        group.append(_rect(rect_x, rect_y, rect_wd, rect_ht, class_name))
-                i += 1
+            for start_i, run_len in _runs_of_step(arr, direction):
+                rect_x = x + (start_i-1) * ch_wd + rect_x_off
+                rect_y = y - (ch_ht  * 0.6)
+                rect_ht = ch_ht + ht_wd_addend
+                rect_wd = run_len * ch_wd + ht_wd_addend
+                parts.append(_rect(rect_x, rect_y, rect_wd, rect_ht, class_name))
 
         horiz_rect_x = horizontal_label_rhs + 0.5 * ch_wd
 
         #
         # Phi, values and rectangles
         #
-        phi_group = []
-        with svg_group(phi_group, id="Phi"):
-            # Draw Phi highlighting rectangles for maximal intervals where values increase by 1
-            phi_rect_group = []
-            with svg_group(phi_rect_group, id="PhiRects"):
-                _draw_horiz_highlight_rects(phi_rect_group, phi, horiz_rect_x, from_top * ch_ht,
-                    direction=1, class_name="plum-highlight")
-            phi_group.extend(phi_rect_group)
-
-            # Draw phi label and values
-            phi_vals_group = []
-            with svg_group(phi_vals_group, id="PhiVals"):
-                label_wd = 1 * ch_wd  # width of "φ" label as multiple of char width
-                x = horizontal_label_rhs - label_wd
-                phi_vals_group.append(_text(x, from_top * ch_ht, lab, anc_end, 'φ'))
-                for i, phi_val in enumerate(phi):
-                    x = horizontal_label_rhs + (i+0.5) * ch_wd
-                    phi_vals_group.append(_text(x, from_top * ch_ht, lab, anc_end, phi_val))
-            phi_group.extend(phi_vals_group)
-        svg_content += ''.join(phi_group)
+        _g_open(parts, "Phi")
+        # Draw Phi highlighting rectangles for maximal intervals where values increase by 1
+        _g_open(parts, "PhiRects", flatten=flat)
+        _draw_horiz_highlight_rects(phi, horiz_rect_x, from_top * ch_ht,
+            direction=1, class_name="plum-highlight")
+        _g_close(parts, flatten=flat)
+
+        # Draw phi label and values
+        _g_open(parts, "PhiVals", flatten=flat)
+        label_wd = 1 * ch_wd  # width of "φ" label as multiple of char width
+        _emit_horiz_row(phi, from_top * ch_ht, 'φ', label_wd)
+        _g_close(parts, flatten=flat)
+        _g_close(parts)
         from_top += 1
 
         #
         # Phi-inverse, values and rectangles
         #
-        phiinv_group = []
-        with svg_group(phiinv_group, id="PhiInv"):
-            # Draw Phi-inverse highlighting rectangles for maximal ascending intervals
-            phiinv_rect_group = []
-            with svg_group(phiinv_rect_group, id="PhiInvRects"):
-                _draw_horiz_highlight_rects(phiinv_rect_group, phiinv, horiz_rect_x, from_top * ch_ht,
-                    direction=1, class_name="plum-highlight")
-            phiinv_group.extend(phiinv_rect_group)
-
-            # Draw phiinv label and values
-            phiinv_vals_group = []
-            with svg_group(phiinv_vals_group, id="PhiInvVals"):
-                label_wd = 1.05 * ch_wd  # width of "φ-1" label as multiple of char width
-                x = horizontal_label_rhs - label_wd
-                phiinv_vals_group.append(_text(x, from_top * ch_ht, lab, anc_end, 'φ⁻¹'))
-                for i, phiinv_val in enumerate(phiinv):
-                    x = horizontal_label_rhs + (i+0.5) * ch_wd
-                    phiinv_vals_group.append(_text(x, from_top * ch_ht, lab, anc_end, phiinv_val))
-            phiinv_group.extend(phiinv_vals_group)
-        svg_content += ''.join(phiinv_group)
+        _g_open(parts, "PhiInv")
+        # Draw Phi-inverse highlighting rectangles for maximal ascending intervals
+        _g_open(parts, "PhiInvRects", flatten=flat)
+        _draw_horiz_highlight_rects(phiinv, horiz_rect_x, from_top * ch_ht,
+            direction=1, class_name="plum-highlight")
+        _g_close(parts, flatten=flat)
+
+        # Draw phiinv label and values
+        _g_open(parts, "PhiInvVals", flatten=flat)
+        label_wd = 1.05 * ch_wd  # width of "φ-1" label as multiple of char width
+        _emit_horiz_row(phiinv, from_top * ch_ht, 'φ⁻¹', label_wd)
+        _g_close(parts, flatten=flat)
+        _g_close(parts)
         from_top += 1
 
         #
         # PLCP, values and rectangles
         #
         def _add_plcp():
-            plcp_group = []
-            with svg_group(plcp_group, id="PLCP"):
-                # Draw PLCP highlighting rectangles for maximal descending intervals
-                plcp_rect_group = []
-                with svg_group(plcp_rect_group, id="PLCPrects"):
-                    _draw_horiz_highlight_rects(plcp_rect_group, plcp, horiz_rect_x, from_top * ch_ht,
-                        direction=-1, class_name="plum-highlight")
-                plcp_group.extend(plcp_rect_group)
-
-                # Draw PLCP label and values
-                plcp_vals_group = []
-                with svg_group(plcp_vals_group, id="PLCPvals"):
-                    label_wd = 1 * ch_wd  # width of "φ-1" label as multiple of char width
-                    x = horizontal_label_rhs - label_wd
-                    plcp_vals_group.append(_text(x, from_top * ch_ht, lab, anc_end, 'PLCP'))
-                    for i, plcp_val in enumerate(plcp):
-                        x = horizontal_label_rhs + (i+0.5) * ch_wd
-                        plcp_vals_group.append(_text(x, from_top * ch_ht, lab, anc_end, plcp_val))
-                plcp_group.extend(plcp_vals_group)
-            return ''.join(plcp_group)
-
-        svg_content += _add_plcp()
+            _g_open(parts, "PLCP")
+            # Draw PLCP highlighting rectangles for maximal descending intervals
+            _g_open(parts, "PLCPrects", flatten=flat)
+            _draw_horiz_highlight_rects(plcp, horiz_rect_x, from_top * ch_ht,
+                direction=-1, class_name="plum-highlight")
+            _g_close(parts, flatten=flat)
+
+            # Draw PLCP label and values
+            _g_open(parts, "PLCPvals", flatten=flat)
+            label_wd = 1 * ch_wd  # width of "φ-1" label as multiple of char width
+            _emit_horiz_row(plcp, from_top * ch_ht, 'PLCP', label_wd)
+            _g_close(parts, flatten=flat)
+            _g_close(parts)
+
+        _add_plcp()
         from_top += 1
 
         #
         # PLCS, values and rectangles
         #
         def _add_plcs():
-            plcs_group = []
-            with svg_group(plcs_group, id="PLCS"):
-                # Draw PLCS highlighting rectangles for maximal ascending intervals
-                plcs_rect_group = []
-                with svg_group(plcs_rect_group, id="PLCSrect"):
-                    _draw_horiz_highlight_rects(plcs_rect_group, plcs, horiz_rect_x, from_top * ch_ht,
-                        direction=1, class_name="plum-highlight")
-                plcs_group.extend(plcs_rect_group)
-
-                plcs_vals_group = []
-                with svg_group(plcs_vals_group, id="PLCSvals"):
-                    # Draw PLCS label and values
-                    label_wd = 1 * ch_wd  # width of "PLCS" label as multiple of char width
-                    x = horizontal_label_rhs - label_wd
-                    plcs_vals_group.append(_text(x, from_top * ch_ht, lab, anc_end, 'PLCS'))
-                    for i, plcs_val in enumerate(plcs):
-                        x = horizontal_label_rhs + (i+0.5) * ch_wd
-                        plcs_vals_group.append(_text(x, from_top * ch_ht, lab, anc_end, plcs_val))
-                plcs_group.extend(plcs_vals_group)
-            return ''.join(plcs_group)
-
-        svg_content += _add_plcs()
+            _g_open(parts, "PLCS")
+            # Draw PLCS highlighting rectangles for maximal ascending intervals
+            _g_open(parts, "PLCSrect", flatten=flat)
+            _draw_horiz_highlight_rects(plcs, horiz_rect_x, from_top * ch_ht,
+                direction=1, class_name="plum-highlight")
+            _g_close(parts, flatten=flat)
+
+            _g_open(parts, "PLCSvals", flatten=flat)
+            # Draw PLCS label and values
+            label_wd = 1 * ch_wd  # width of "PLCS" label as multiple of char width
+            _emit_horiz_row(plcs, from_top * ch_ht, 'PLCS', label_wd)
+            _g_close(parts, flatten=flat)
+            _g_close(parts)
+
+        _add_plcs()
         from_top += 1
+        _flush()
 
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     #
@@ -423,7 +567,7 @@ def render(t,
     # Calculate threshold width if thresholds are shown
     threshold_width = 0
     if show_thresholds:
-        num_threshold_cols = len(suite.alphabet) - 1  # Omit smallest character
+        num_threshold_cols = alphabet_size - 1  # Omit smallest character
         threshold_width = num_threshold_cols * (ch_wd + 5)
 
     if which in ["vertical", "both"]:
@@ -431,86 +575,74 @@ def render(t,
         bwm_start_y = (10 * ch_ht + padding - 30) if which == 'both' else (3 * ch_ht)
         right_hand_reference = overall_width - padding/2
 
+        # Every column has its label, then its values, at the same y coordinates
+        col_lab_y = bwm_start_y - (ch_ht * 1.2)
+        col_val_ys = _coords(col_lab_y, 1, ch_ht, n)
+        # Top of the LCP/LCS rectangles over each BWM row; the open rectangle
+        # for row i sits over row i-1, so it uses the entry before
+        y_addend = 5
+        rect_ys = [bwm_start_y + (i-1) * ch_ht + y_addend for i in range(n)]
+
+        # Helper function to draw highlighting rectangles for maximal
+        # ascending intervals down the column whose values end at col_x
+        def _draw_vert_highlight_rects(arr, col_x, class_name="teal-highlight"):
+            nudge_smaller = 4
+            rect_x = col_x - 0.85 * ch_wd
+            rect_wd = ch_wd - nudge_smaller
+            for start_i, run_len in _runs_of_step(arr, 1):
+                rect_ht = run_len * ch_ht - nudge_smaller
+                rect_y = bwm_start_y + start_i * ch_ht - 0.85 * ch_ht
+                parts.append(
+                    _rect(rect_x + (nudge_smaller / 2), rect_y + (nudge_smaller / 2),
+                             rect_wd, rect_ht, class_name))
+
+        # Helper function to draw a column label followed by one value per row
+        def _emit_vert_col(arr, x, label):
+            x = round(x)
+            parts.append(_TEXT_LABEL % (x, _f(col_lab_y), label))
+            parts.append(_text_column(x, col_val_ys, arr))
+
         #
         # DA (if MUMs are shown)
         #
         if show_mums:
             from_right += ch_wd
             da_st_x = right_hand_reference - from_right
-            da_lab_y = bwm_start_y - (ch_ht * 1.2)
-            da_group = []
-            with svg_group(da_group, id="DA"):
-                da_group.append(_text(da_st_x, da_lab_y, lab, anc_end, 'DA'))
-                for i, da_val in enumerate(da):
-                    y = da_lab_y + (i+1) * ch_ht
-                    da_group.append(_text(da_st_x, y, lab, anc_end, da_val))
-            svg_content += ''.join(da_group)
+            _g_open(parts, "DA")
+            _emit_vert_col(da, da_st_x, 'DA')
+            _g_close(parts)
 
         #
         # SA
         #
         def _add_sa():
-            sa_group = []
             sa_st_x = right_hand_reference - from_right  # SA starts one char width before right edge
-            with svg_group(sa_group, id="SA"):
-                sa_lab_y = bwm_start_y - (ch_ht * 1.2)
-                sa_group.append(_text(sa_st_x, sa_lab_y, lab, anc_end, 'SA'))
-                for i, sa_val in enumerate(mysa):
-                    y = sa_lab_y + (i+1) * ch_ht
-                    sa_group.append(_text(sa_st_x, y, lab, anc_end, sa_val))
-            return sa_st_x, ''.join(sa_group)
+            _g_open(parts, "SA")
+            _emit_vert_col(mysa, sa_st_x, 'SA')
+            _g_close(parts)
+            return sa_st_x
 
         from_right += ch_wd
-        sa_st_x, content = _add_sa()
-        svg_content += content
+        sa_st_x = _add_sa()
 
         #
         # LF, values and rectangles
         #
         def _add_lf():
             lf_st_x = right_hand_reference - from_right
-            lf_group = []
-            with svg_group(lf_group, id="LF"):
-                # Draw LF highlighting rectangles for maximal ascending intervals
-                lf_rects_group = []
-                with svg_group(lf_rects_group, id="LFrects"):
-                    i = 0
-                    while i < len(lf):
-                        if i == 0 or lf[i] != lf[i-1] + 1:
-                            # Find start, end of potential interval
-                            start_i = i
-                            while i + 1 < len(lf) and lf[i+1] == lf[i] + 1:
-                                i += 1
-                            if i - start_i + 1 >= 2:
-                                nudge_smaller = 4
-                                rect_ht = (i - start_i + 1) * ch_ht - nudge_smaller
-                                rect_x = lf_st_x - 0.85 * ch_wd
-                                rect_y = bwm_start_y + start_i * ch_ht - 0.85 * ch_ht
-                                rect_wd = ch_wd - nudge_smaller
-                                lf_rects_group.append(
-                                    _rect(
-                                        rect_x + (nudge_smaller / 2),
-                                        rect_y + (nudge_smaller / 2),
-                                        rect_wd,
-                                        rect_ht,
-                                        'teal-highlight'
-                                    )
-                                )
-                        i += 1
-                lf_group.extend(lf_rects_group)
-
-                lf_vals_group = []
-                with svg_group(lf_vals_group, id="LF"):
-                    lf_lab_y = bwm_start_y - (ch_ht * 1.2)
-                    lf_vals_group.append(_text(lf_st_x, lf_lab_y, lab, anc_end, 'LF'))
-                    for i, lf_val in enumerate(lf):
-                        y = lf_lab_y + (i+1) * ch_ht
-                        lf_vals_group.append(_text(lf_st_x, y, lab, anc_end, lf_val))
-                lf_group.extend(lf_vals_group)
-            return ''.join(lf_group)
+            _g_open(parts, "LF")
+            # Draw LF highlighting rectangles for maximal ascending intervals
+            _g_open(parts, "LFrects", flatten=flat)
+            _draw_vert_highlight_rects(lf, lf_st_x)
+            _g_close(parts, flatten=flat)
+
+            _g_open(parts, "LFvals", flatten=flat)
+            _emit_vert_col(lf, lf_st_x, 'LF')
+            _g_close(parts, flatten=flat)
+            _g_close(parts)
 
         from_right += (1.5 * ch_wd)
-        svg_content += _add_lf()
+        _add_lf()
 
         # We've only increased "from_right" for LF and SA and DA so far.  Now we
         # need to inccrease it for LCS and L, so there's an extra - (2 *1.5 * ch_wd)
@@ -521,417 +653,420 @@ def render(t,
         bwm_start_x = (
             right_hand_reference - from_right - (2 * 1.5 * ch_wd) - (2 * ch_wd) - (n - 2) * bwm_narrow_col_wd
         )
+        row_len = n  # All BWM rows are rotations of T
 
         #
         # LCS column, values
         #
         def _add_lcs():
-            lcs_group = []
             lcs_st_x = right_hand_reference - from_right
-            with svg_group(lcs_group, id="LCS"):
-                lcs_vals_group = []
-                with svg_group(lcs_vals_group, id="LCSvals"):
-                    lcs_lab_y = bwm_start_y - (ch_ht * 1.2)
-                    lcs_vals_group.append(_text(lcs_st_x, lcs_lab_y, lab, anc_end, 'LCS'))
-                    for i, lcs_val in enumerate(lcs):
-                        y = lcs_lab_y + (i+1) * ch_ht
-                        lcs_vals_group.append(_text(lcs_st_x, y, lab, anc_end, lcs_val))
-                lcs_group.extend(lcs_vals_group)
-            return ''.join(lcs_group)
+            _g_open(parts, "LCS")
+            _g_open(parts, "LCSvals", flatten=flat)
+            _emit_vert_col(lcs, lcs_st_x, 'LCS')
+            _g_close(parts, flatten=flat)
+            _g_close(parts)
+
+        from_right += 1.5 * ch_wd
+        _add_lcs()
+
+        from_right += 1.8 * ch_wd
+        l_col_x = right_hand_reference - from_right
+        f_lab_x = bwm_start_x + ch_wd * 0.3
 
         #
-        # LCS rectangles on top of the BWM
+        # L column letters, F column letters and LCS rectangles, filled in a
+        # single pass over the rows.  L and F letters come straight from the
+        # BWT and SA, so the BWM rows are only walked by _add_bwm below.
         #
-        def _add_lcs_rects():
-            lcs_group = []
-            with svg_group(lcs_group, id="LCSrects"):
-                y_addend = 5
-                x_addend = -2
-                right_extreme = (len(mybwm[0]) - 2) * bwm_narrow_col_wd + ch_wd * 2.3
-                
-                lcs_rect1_group = []
-                with svg_group(lcs_rect1_group, id="LCSrect1"):
-                    for i in range(len(mybwm)):
-                        y = bwm_start_y + (i-1) * ch_ht + y_addend
-                        lcs_val = lcs[i] if i < len(lcs) else 0
-                        if lcs_val > 0:
-                            wide_part = min(lcs_val, 1) * ch_wd
-                            narrow_part = max(lcs_val-1, 0) * bwm_narrow_col_wd
-                            bump = 0 if lcs_val < 2 else 8
-                            total = wide_part + narrow_part + bump
-                            lcs_offset = right_extreme - total
-                            this_lcs_start_x = bwm_start_x + lcs_offset + x_addend
-                            lcs_rect1_group.append(
-                                _rect(this_lcs_start_x, y, total, ch_ht, 'red-highlight'))
-                lcs_group.extend(lcs_rect1_group)
-
-                lcs_rect2_group = []
-                with svg_group(lcs_rect2_group, id="LCSrect2"):
-                    for i in range(len(mybwm)):
-                        y = bwm_start_y + (i-2) * ch_ht + y_addend
-                        lcs_val = lcs[i] if i < len(lcs) else 0
-                        if lcs_val > 0 and i > 0:
-                            wide_part = min(lcs_val, 1) * ch_wd
-                            narrow_part = max(lcs_val-1, 0) * bwm_narrow_col_wd
-                            bump = 0 if lcs_val < 2 else 8
-                            total = wide_part + narrow_part + bump
-                            lcs_offset = right_extreme - total
-                            this_lcs_start_x = bwm_start_x + lcs_offset + x_addend
-                            lcs_rect2_group.append(
-                                _rect(this_lcs_start_x, y, total, ch_ht, 'red-outline'))
-                lcs_group.extend(lcs_rect2_group)
-            return ''.join(lcs_group)
-
-        from_right += 1.5 * ch_wd
-        svg_content += _add_lcs()
+        l_parts, f_parts, lcs_rects1, lcs_rects2 = [], [], [], []
+
+        def _fill_row_parts():
+            x_addend = -2
+            right_extreme = (row_len - 2) * bwm_narrow_col_wd + ch_wd * 2.3
+            # L letters are red for an LCS suffix, F letters blue for an LCP
+            # prefix, black otherwise.  As in the BWM, x and the color are
+            # filled into one template per color up front.
+            l_x = round(l_col_x - ch_wd * 0.1)
+            f_x = round(f_lab_x - ch_wd * 0.1)
+            l_red, l_black = (_TEXT_MONO % (l_x, '%s', color, '%s') for color in ('red', 'black'))
+            f_blue, f_black = (_TEXT_MONO % (f_x, '%s', color, '%s') for color in ('blue', 'black'))
+            for i, (y, l_char, sa_val, lcp_val, lcs_val) in enumerate(
+                    zip(col_val_ys, bwt, mysa, lcp, lcs)):
+                l_parts.append((l_red if lcs_val > 0 else l_black) % (y, l_char))
+                f_parts.append((f_blue if lcp_val > 0 else f_black) % (y, t[sa_val]))
+                if lcs_val > 0:
+                    # Solid rectangle over this rotation, open rectangle
+                    # over the one above it
+                    wide_part = min(lcs_val, 1) * ch_wd
+                    narrow_part = max(lcs_val-1, 0) * bwm_narrow_col_wd
+                    bump = 0 if lcs_val < 2 else 8
+                    total = wide_part + narrow_part + bump
+                    lcs_offset = right_extreme - total
+                    this_lcs_start_x = bwm_start_x + lcs_offset + x_addend
+                    lcs_rects1.append((this_lcs_start_x, rect_ys[i], total))
+                    if i > 0:
+                        lcs_rects2.append((this_lcs_start_x, rect_ys[i-1], total))
+
+        _fill_row_parts()
 
         #
         # L column, letters and backgorund rectangle
         #
         def _add_l():
-            l_group = []
-            with svg_group(l_group, id="L"):
-                l_col_x = right_hand_reference - from_right
-                l_lab_y = bwm_start_y - (ch_ht * 1.2)
-                l_rect_y = l_lab_y + ch_ht * 0.35
-                l_group.append(_rect(l_col_x - (ch_wd * 0.45), l_rect_y, ch_wd, n * ch_ht, 'l-column'))
-                l_group.append(_text(l_col_x  + ch_wd * 0.2, l_lab_y, lab, anc_end, 'L'))
-                for i, row in enumerate(mybwm):
-                    y = l_lab_y + (i+1) * ch_ht
-                    lcs_val = lcs[i] if i < len(lcs) else 0
-                    color = "red" if lcs_val > 0 else "black"
-                    l_group.append(_text(l_col_x - ch_wd * 0.1, y, mono, f'fill="{color}"', row[-1]))
-            return ''.join(l_group)
-
-        from_right += 1.8 * ch_wd
-        svg_content += _add_l()
+            _g_open(parts, "L")
+            l_rect_y = col_lab_y + ch_ht * 0.35
+            parts.append(_rect(l_col_x - (ch_wd * 0.45), l_rect_y, ch_wd, n * ch_ht, 'l-column'))
+            parts.append(_TEXT_LABEL % (_f(l_col_x + ch_wd * 0.2), _f(col_lab_y), 'L'))
+            parts.extend(l_parts)
+            _g_close(parts)
+
+        _add_l()
+
+        # With the raster backend, BWM cells and the rectangles over them are
+        # drawn onto one canvas and emitted as a single image after the LCP
+        # rectangles, which is where the last of them would otherwise go
+        raster = None
+        if backend == "raster":
+            from .raster import BwmRaster
+            raster = BwmRaster(
+                bwm_start_x - ch_wd, bwm_start_y - 1.2 * ch_ht,
+                bwm_start_x + (row_len - 2) * bwm_narrow_col_wd + 3.3 * ch_wd,
+                bwm_start_y + n * ch_ht,
+                monospace_font)
+
+        def _rects(rects, class_name):
+            """Draw (x, y, width) rectangles, one BWM row high."""
+            if raster is not None:
+                for x, y, width in rects:
+                    raster.rect(x, y, width, ch_ht, class_name)
+            else:
+                parts.extend([_rect(x, y, width, ch_ht, class_name)
+                              for x, y, width in rects])
 
         #
         # BWM, with character coloring according to LCP/LCS.
         # Excluding F and L columns
         #
         def _add_bwm():
-            bwm_group = []
-            with svg_group(bwm_group, id="BWM"):
-                for j in range(len(mybwm[0]) - 1):  # Exclude last character (L column)
-                    row_i_group = []
-                    with svg_group(row_i_group, id=f"BWMCol{j}"):
-                        for i, row in enumerate(mybwm):
-                            y = bwm_start_y + (i-0.2) * ch_ht
-                            lcp_val = lcp[i] if i < len(lcp) else 0
-                            lcs_val = lcs[i] if i < len(lcs) else 0
-                            char = row[j]
-                            x = bwm_start_x + j * ch_wd
-                            if j != 0:
-                                x -= (j - 1) * (ch_wd - bwm_narrow_col_wd)
-                            # Determine color: blue for LCP prefix, red for LCS suffix, black otherwise
-                            color = "black"
-                            if j < lcp_val:
-                                color = "blue"
-                            elif j >= len(row) - lcs_val and lcs_val > 0:
-                                color = "red"
-                            row_i_group.append(_text(x, y, mono, f'fill="{color}"', char))
-                    bwm_group.extend(row_i_group)
-            return ''.join(bwm_group)
-
-        svg_content += _add_bwm()
-        svg_content += _add_lcs_rects()
+            row_ys = _coords(bwm_start_y, -0.2, ch_ht, len(mybwm))
+            # Column where each row's LCS suffix starts (past the end if none)
+            lcs_starts = [row_len - lcs_val if lcs_val > 0 else row_len for lcs_val in lcs]
+            col_xs, col_tmpls = _bwm_columns(
+                bwm_start_x, ch_wd, bwm_narrow_col_wd,
+                row_len - 1)  # Exclude last character (L column)
+            if raster is not None:
+                # Column 0 is the F column: the SVG renderer hides it under the
+                # opaque F background, which the image would be drawn over
+                for j, x in enumerate(col_xs[1:], 1):
+                    for y, char, lcp_val, lcs_start in zip(row_ys, mybwm.column(j), lcp, lcs_starts):
+                        color = "blue" if j < lcp_val else "red" if j >= lcs_start else "black"
+                        raster.text(x, y, char, color)
+                return
+            emit = parts.append
+            _g_open(parts, "BWM")
+            for j, (blue_tmpl, red_tmpl, black_tmpl) in enumerate(col_tmpls):
+                _g_open(parts, f"BWMCol{j}", flatten=flat)
+                for y, char, lcp_val, lcs_start in zip(row_ys, mybwm.column(j), lcp, lcs_starts):
+                    # Determine color: blue for LCP prefix, red for LCS suffix, black otherwise
+                    if j < lcp_val:
+                        emit(blue_tmpl % (y, char))
+                    elif j >= lcs_start:
+                        emit(red_tmpl % (y, char))
+                    else:
+                        emit(black_tmpl % (y, char))
+                _g_close(parts, flatten=flat)
+                _flush()
+            _g_close(parts)
+
+        #
+        # LCS rectangles on top of the BWM
+        #
+        def _add_lcs_rects():
+            if raster is not None:
+                _rects(lcs_rects1, 'red-highlight')
+                _rects(lcs_rects2, 'red-outline')
+                return
+            _g_open(parts, "LCSrects")
+            _g_open(parts, "LCSrect1", flatten=flat)
+            _rects(lcs_rects1, 'red-highlight')
+            _g_close(parts, flatten=flat)
+            _g_open(parts, "LCSrect2", flatten=flat)
+            _rects(lcs_rects2, 'red-outline')
+            _g_close(parts, flatten=flat)
+            _g_close(parts)
+
+        _add_bwm()
+        _add_lcs_rects()
+        _flush()
 
         #
         # F column, letters and backgorund rectangle
         #
         def _add_f():
-            f_group = []
-            with svg_group(f_group, id="F"):
-                f_lab_y = bwm_start_y - (ch_ht * 1.2)
-                f_lab_x = bwm_start_x + ch_wd * 0.3
-                f_rect_y = f_lab_y + ch_ht * 0.35
-                f_group.append(_rect(f_lab_x - (ch_wd * 0.45), f_rect_y, ch_wd, n * ch_ht, 'f-column'))
-                f_group.append(_text(f_lab_x + ch_wd * 0.2, f_lab_y, lab, anc_end, 'F'))
-                for i, row in enumerate(mybwm):
-                    y = f_lab_y + (i+1) * ch_ht
-                    lcp_val = lcp[i] if i < len(lcp) else 0
-                    # Determine color: blue for LCP prefix, black otherwise
-                    color = "blue" if lcp_val > 0 else "black"
-                    f_group.append(_text(f_lab_x - ch_wd * 0.1, y, mono, f'fill="{color}"', row[0]))
-            return ''.join(f_group)
-
-        svg_content += _add_f()
+            _g_open(parts, "F")
+            f_rect_y = col_lab_y + ch_ht * 0.35
+            parts.append(_rect(f_lab_x - (ch_wd * 0.45), f_rect_y, ch_wd, n * ch_ht, 'f-column'))
+            parts.append(_TEXT_LABEL % (_f(f_lab_x + ch_wd * 0.2), _f(col_lab_y), 'F'))
+            parts.extend(f_parts)
+            _g_close(parts)
+
+        _add_f()
 
         #
         # LCP column, values and then rectangles on top of the BWM
         #
         def _add_lcp(lcp_start_x):
-            lcp_group = []
-            with svg_group(lcp_group, id="LCP"):
-                lcp_vals_group = []
-                with svg_group(lcp_vals_group, id="LCPvals"):
-                    lcp_lab_y = bwm_start_y - (ch_ht * 1.2)
-                    lcp_vals_group.append(_text(lcp_start_x, lcp_lab_y, lab, anc_end, 'LCP'))
-                    for i, lcp_val in enumerate(lcp):
-                        y = lcp_lab_y + (i+1) * ch_ht
-                        lcp_vals_group.append(_text(lcp_start_x, y, lab, anc_end, lcp_val))
-                lcp_group.extend(lcp_vals_group)
-            return ''.join(lcp_group)
+            _g_open(parts, "LCP")
+            _g_open(parts, "LCPvals", flatten=flat)
+            _emit_vert_col(lcp, lcp_start_x, 'LCP')
+            _g_close(parts, flatten=flat)
+            _g_close(parts)
 
         def _add_lcp_rects():
-            lcp_group = []
-            with svg_group(lcp_group, id="LCPrects"):
-                # Draw LCP highlighting rectangles; these are the solid rectangles over the
-                # bottom rotation involved in the LCP
-                y_addend = 5
-                lcp_rect1_group = []
-                rect_x = bwm_start_x - 0.15 * ch_wd
-                with svg_group(lcp_rect1_group, id="LCPrect1"):
-                    for i in range(len(mybwm)):
-                        lcp_val = lcp[i] if i < len(lcp) else 0
-                        if lcp_val > 0:
-                            y = bwm_start_y + (i-1) * ch_ht + y_addend
-                            wide_part = min(lcp_val, 1) * ch_wd
-                            narrow_part = max(lcp_val-1, 0) * bwm_narrow_col_wd
-                            bump = 0 if lcp_val < 2 else 5
-                            lcp_width = wide_part + narrow_part + bump
-                            lcp_rect1_group.append(_rect(rect_x, y, lcp_width, ch_ht, 'blue-highlight'))
-                lcp_group.extend(lcp_rect1_group)
-
-                # Draw LCP highlighting rectangles; these are the open rectangles over the
-                # top rotation involved in the LCP
-                lcp_rect2_group = []
-                with svg_group(lcp_rect2_group, id="LCPrect2"):
-                    for i in range(len(mybwm)):
-                        lcp_val = lcp[i] if i < len(lcp) else 0
-                        if lcp_val > 0 and i > 0:
-                            y = bwm_start_y + (i-2) * ch_ht + y_addend
-                            wide_part = min(lcp_val, 1) * ch_wd
-                            narrow_part = max(lcp_val-1, 0) * bwm_narrow_col_wd
-                            bump = 0 if lcp_val < 2 else 5
-                            lcp_width = wide_part + narrow_part + bump
-                            lcp_rect2_group.append(
-                                _rect(rect_x, y, lcp_width, ch_ht, 'blue-outline'))
-                lcp_group.extend(lcp_rect2_group)
-            return ''.join(lcp_group)
+            # Draw LCP highlighting rectangles; the solid ones are over the
+            # bottom rotation involved in the LCP and the open ones over the top
+            rect_x = bwm_start_x - 0.15 * ch_wd
+            lcp_rects1, lcp_rects2 = [], []
+            for i, lcp_val in enumerate(lcp[:len(mybwm)]):
+                if lcp_val > 0:
+                    wide_part = min(lcp_val, 1) * ch_wd
+                    narrow_part = max(lcp_val-1, 0) * bwm_narrow_col_wd
+                    bump = 0 if lcp_val < 2 else 5
+                    lcp_width = wide_part + narrow_part + bump
+                    lcp_rects1.append((rect_x, rect_ys[i], lcp_width))
+                    if i > 0:
+                        lcp_rects2.append((rect_x, rect_ys[i-1], lcp_width))
+
+            if raster is not None:
+                _rects(lcp_rects1, 'blue-highlight')
+                _rects(lcp_rects2, 'blue-outline')
+                _g_open(parts, "BWM")
+                parts.append(raster.to_svg())
+                _g_close(parts)
+                return
+            _g_open(parts, "LCPrects")
+            _g_open(parts, "LCPrect1", flatten=flat)
+            _rects(lcp_rects1, 'blue-highlight')
+            _g_close(parts, flatten=flat)
+            _g_open(parts, "LCPrect2", flatten=flat)
+            _rects(lcp_rects2, 'blue-outline')
+            _g_close(parts, flatten=flat)
+            _g_close(parts)
 
         lcp_start_x = bwm_start_x - ch_wd - 2 + space - threshold_width + threshold_shift
 
-        svg_content += _add_lcp(lcp_start_x)
-        svg_content += _add_lcp_rects()
+        _add_lcp(lcp_start_x)
+        _add_lcp_rects()
 
         #
         # FL: values and rectangles
         #
         def _add_fl(fl_start_x):
-            fl_group = []
-            with svg_group(fl_group, id="FL"):
-                # Draw FL highlighting rectangles for maximal ascending intervals
-                fl_rects_group = []
-                with svg_group(fl_rects_group, id="FLrects"):
-                    i = 0
-                    while i < len(fl):
-                        if i == 0 or fl[i] != fl[i-1] + 1:
-                            start_i = i
-                            while i + 1 < len(fl) and fl[i+1] == fl[i] + 1:
-                                i += 1
-                            if i - start_i + 1 >= 2:
-                                nudge_smaller = 4
-                                rect_ht = (i - start_i + 1) * ch_ht - nudge_smaller
-                                rect_x = fl_start_x - 0.85 * ch_wd
-                                rect_y = bwm_start_y + start_i * ch_ht - 0.85 * ch_ht
-                                rect_wd = ch_wd - nudge_smaller
-                                fl_rects_group.append(
-                                    _rect(rect_x + (nudge_smaller / 2), rect_y + (nudge_smaller / 2),
-                                    rect_wd, rect_ht, 'teal-highlight'))
-                        i += 1
-                fl_group.extend(fl_rects_group)
-
-                fl_vals_group = []
-                with svg_group(fl_vals_group, id="FLvals"):
-                    fl_lab_y = bwm_start_y - (ch_ht * 1.2)
-                    fl_vals_group.append(_text(fl_start_x, fl_lab_y, lab, anc_end, 'FL'))
-                    for i, fl_val in enumerate(fl):
-                        y = fl_lab_y + (i+1) * ch_ht
-                        fl_vals_group.append(_text(fl_start_x, y, lab, anc_end, fl_val))
-                fl_group.extend(fl_vals_group)
-            return ''.join(fl_group)
+            _g_open(parts, "FL")
+            # Draw FL highlighting rectangles for maximal ascending intervals
+            _g_open(parts, "FLrects", flatten=flat)
+            _draw_vert_highlight_rects(fl, fl_start_x)
+            _g_close(parts, flatten=flat)
+
+            _g_open(parts, "FLvals", flatten=flat)
+            _emit_vert_col(fl, fl_start_x, 'FL')
+            _g_close(parts, flatten=flat)
+            _g_close(parts)
 
         fl_start_x = lcp_start_x - ch_wd - 15 + space
 
-        svg_content += _add_fl(fl_start_x)
+        _add_fl(fl_start_x)
 
         #
         # Rank array
         #
         def _add_rank(rank_start_x):
-            rank_group = []
-            with svg_group(rank_group, id="Rank"):
-                rank_lab_y = bwm_start_y - (ch_ht * 1.2)
-                rank_group.append(_text(rank_start_x, rank_lab_y, lab, anc_end, 'Rank'))
-                for i, rank_val in enumerate(rank):
-                    y = rank_lab_y + (i+1) * ch_ht
-                    rank_group.append(_text(rank_start_x, y, lab, anc_end, rank_val))
-            return ''.join(rank_group)
+            _g_open(parts, "Rank")
+            _emit_vert_col(rank, rank_start_x, 'Rank')
+            _g_close(parts)
 
         rank_start_x = fl_start_x - ch_wd - 20 + space
-        svg_content += _add_rank(rank_start_x)
+        _add_rank(rank_start_x)
+        _flush()
 
 
         #
         # Thresholds columns (if requested)
         #
         if show_thresholds:
-            threshold_group = []
-            with svg_group(threshold_group, id="Thresholds"):
-                threshold_start_x = fl_start_x + ch_wd + threshold_shift  # Start after FL column
-                threshold_chars = suite.alphabet[1:]  # Omit F character
-                for j, char in enumerate(threshold_chars):
-                    threshold_x = threshold_start_x + (j+0.8) * ch_wd
-                    threshold_group.append(
-                        _text(threshold_x, bwm_start_y - 1.25*ch_ht, lab, anc_end, char))
-                    # Draw rectangles for consecutive stretches of '=', '^', and 'v'
-                    i = 0
-                    while i < len(thresholds[char]):
-                        if thresholds[char][i] in ['=', '^', 'v']:
-                            # Find the end of this stretch
-                            start_i = i
-                            char_type = thresholds[char][i]
-                            while i < len(thresholds[char]) and thresholds[char][i] == char_type:
-                                i += 1
-                            # Draw rectangle for this stretch
-                            if i - start_i >= 1:
-                                nudge_smaller = 4
-                                rect_y = bwm_start_y + start_i * ch_ht - (0.8*ch_ht) + nudge_smaller/2
-                                rect_height = (i - start_i) * ch_ht - nudge_smaller
-                                rect_width = ch_wd - nudge_smaller
-                                rect_x = threshold_x - (0.7*ch_wd) + nudge_smaller/2
-                                fill_color = {
-                                    '=': "medgray-highlight",    # Medium gray
-                                    '^': "lightgray-highlight",  # Light gray
-                                    'v': "lightgray-highlight"   # Light gray
-                                }[char_type]
-                                threshold_group.append(
-                                    _rect(rect_x, rect_y, rect_width, rect_height, fill_color))
-                        else:
-                            i += 1
-
-                    # Draw threshold values
-                    for i, threshold_val in enumerate(thresholds[char]):
-                        y = bwm_start_y + (i-0.3) * ch_ht
-                        # Replace characters with Unicode arrows
-                        display_val = threshold_val
-                        if threshold_val == '^':
-                            display_val = '↑'  # Unicode up arrow
-                        elif threshold_val == 'v':
-                            display_val = '↓'  # Unicode down arrow
-                        threshold_group.append(_text(threshold_x, y, lab, anc_end, display_val))
-            svg_content += ''.join(threshold_group)
+            _g_open(parts, "Thresholds")
+            threshold_start_x = fl_start_x + ch_wd + threshold_shift  # Start after FL column
+            threshold_chars = alphabet[1:]  # Omit F character
+            threshold_val_ys = _coords(bwm_start_y, -0.3, ch_ht, n)
+            threshold_xs = [threshold_start_x + (j+0.8) * ch_wd
+                            for j in range(len(threshold_chars))]
+            for char, threshold_x in zip(threshold_chars, threshold_xs):
+                parts.append(
+                    _TEXT_LABEL % (_f(threshold_x), _f(bwm_start_y - 1.25*ch_ht), char))
+                # Draw rectangles for consecutive stretches of '=', '^', and 'v'.
+                # They are unstroked and never overlap, so all of a column's
+                # rectangles of one color can be subpaths of a single path.
+                rect_paths = {}
+                nudge_smaller = 4
+                rect_width = ch_wd - nudge_smaller
+                rect_x = threshold_x - (0.7*ch_wd) + nudge_smaller/2
+                start_i = 0
+                for char_type, run in groupby(thresholds[char]):
+                    run_len = len(list(run))
+                    if char_type in _THRESHOLD_SHADES:
+                        rect_y = bwm_start_y + start_i * ch_ht - (0.8*ch_ht) + nudge_smaller/2
+                        rect_height = run_len * ch_ht - nudge_smaller
+                        rect_paths.setdefault(_THRESHOLD_SHADES[char_type], []).append(
+                            f'M{_f(rect_x)} {_f(rect_y)}h{_f(rect_width)}v{_f(rect_height)}h{_f(-rect_width)}z')
+                    start_i += run_len
+                parts.extend([_PATH % (''.join(subpaths), fill_color)
+                              for fill_color, subpaths in rect_paths.items()])
+
+                # Draw threshold values, with '^' and 'v' shown as Unicode arrows
+                display_vals = ''.join(thresholds[char]).translate(_THRESHOLD_ARROWS)
+                parts.append(_text_column(round(threshold_x), threshold_val_ys, display_vals))
+                _flush()
+            _g_close(parts)
 
         #
         # Separator lines between BWT runs
         #
-        bwm_group = []
-        with svg_group(bwm_group, id="RunLines"):
-            for i in range(len(mybwm)):
-                y = bwm_start_y + i * ch_ht
-                if i > 0 and bwt[i] != bwt[i-1]:
-                    line_x1 = rank_start_x - 1.8 * ch_wd
-                    line_x2 = sa_st_x + ch_wd
-                    line_y = y - (0.85*ch_ht)
-                    bwm_group.append(
-                        f'  <line x1="{line_x1}" y1="{line_y}" '
-                        f'x2="{line_x2}" y2="{line_y}" '
-                        f'class="bwt-separator"/>\n'
-                    )
-        svg_content += ''.join(bwm_group)
+        # All separators are drawn as one path, a horizontal subpath apiece
+        _g_open(parts, "RunLines")
+        line_x1 = rank_start_x - 1.8 * ch_wd
+        line_x2 = sa_st_x + ch_wd
+        run_lines = []
+        for i in range(1, len(mybwm)):
+            if bwt[i] != bwt[i-1]:
+                line_y = bwm_start_y + i * ch_ht - (0.85*ch_ht)
+                run_lines.append(f'M{_f(line_x1)} {_f(line_y)}H{_f(line_x2)}')
+        if run_lines:
+            parts.append(f'  <path d="{"".join(run_lines)}" class="bwt-separator"/>\n')
+        _g_close(parts)
 
         #
         # MUMs
         #
         def _add_mums():
-            mum_group = []
-            with svg_group(mum_group, id="MUMs"):
-                for i in range(len(mybwm)):
-                    y = bwm_start_y + i * ch_ht
-                    # Draw MUM highlighting rectangles for this row
-                    for mum_start, mum_end in mums:
-                        if mum_start == i:
-                            # Highlight only the LCP column for MUM ranges
-                            height = (
-                                ch_ht * (mum_end - mum_start - 1) +
-                                ((ch_ht) * (mum_end - mum_start - 1.5))
-                            )
-                            mum_group.append(
-                                _rect(
-                                    lcp_start_x, y - ch_ht,
-                                    ch_wd, height, 'green-highlight')
-                            )
-                            break  # One MUM box per row
-            return ''.join(mum_group)
-
-        svg_content += _add_mums()
-
-    svg_content += '</svg>'
-    return svg_content
-
-
-def print_arrays(t, show_thresholds=False, show_mums=False):
+            _g_open(parts, "MUMs")
+            # find_mums gives at most one MUM starting at each row, in row
+            # order, so each needs only its own box rather than a scan of
+            # every MUM for every row.  Highlight only the LCP column; the
+            # boxes are subpaths of one path.
+            mum_boxes = []
+            for mum_start, mum_end in mums:
+                y = bwm_start_y + mum_start * ch_ht
+                height = (
+                    ch_ht * (mum_end - mum_start - 1) +
+                    ((ch_ht) * (mum_end - mum_start - 1.5))
+                )
+                mum_boxes.append(
+                    f'M{_f(lcp_start_x)} {_f(y - ch_ht)}h{_f(ch_wd)}v{_f(height)}h{_f(-ch_wd)}z')
+            if mum_boxes:
+                parts.append(_PATH % (''.join(mum_boxes), 'green-highlight'))
+            _g_close(parts)
+
+        _add_mums()
+
+    parts.append('</svg>')
+    if out is not None:
+        _flush()
+        return None
+    return ''.join(parts)
+
+
+def print_arrays(t, show_thresholds=False, show_mums=False, cache_dir=None):
     """Print all BWT-related arrays for the given text."""
-    suite = BwtSuite(t)
-    print(f"Text: {t}")
-    print(f"Length: {len(t)}")
-    print()
-    print("Suffix Array (SA):")
-    print(suite.sa)
-    print()
-    print("Inverse Suffix Array (ISA):")
-    print(suite.isa)
-    print()
-    print("Burrows-Wheeler Transform (BWT):")
-    print(suite.bwt)
-    print()
-    print("Longest Common Prefix (LCP):")
-    print(suite.lcp)
-    print()
-    print("Longest Common Suffix (LCS):")
-    print(suite.lcs)
-    print()
-    print("Permuted LCP (PLCP):")
-    print(suite.plcp)
-    print()
-    print("Permuted LCS (PLCS):")
-    print(suite.plcs)
-    print()
-    print("LF mapping:")
-    print(suite.lf)
-    print()
-    print("FL mapping:")
-    print(suite.fl)
-    print()
-    print("Phi (φ):")
-    print(suite.phi)
-    print()
-    print("Phi-inverse (φ⁻¹):")
-    print(suite.phiinv)
+    suite = _get_suite(t, cache_dir)
+    # Lines are collected and written in one go at the end
+    lines = []
+    emit = lines.append
+    emit(f"Text: {t}")
+    emit(f"Length: {len(t)}")
+    emit('')
+    emit("Suffix Array (SA):")
+    emit(str(suite.sa))
+    emit('')
+    emit("Inverse Suffix Array (ISA):")
+    emit(str(suite.isa))
+    emit('')
+    emit("Burrows-Wheeler Transform (BWT):")
+    emit(str(suite.bwt))
+    emit('')
+    emit("Longest Common Prefix (LCP):")
+    emit(str(suite.lcp))
+    emit('')
+    emit("Longest Common Suffix (LCS):")
+    emit(str(suite.lcs))
+    emit('')
+    emit("Permuted LCP (PLCP):")
+    emit(str(suite.plcp))
+    emit('')
+    emit("Permuted LCS (PLCS):")
+    emit(str(suite.plcs))
+    emit('')
+    emit("LF mapping:")
+    emit(str(suite.lf))
+    emit('')
+    emit("FL mapping:")
+    emit(str(suite.fl))
+    emit('')
+    emit("Phi (φ):")
+    emit(str(suite.phi))
+    emit('')
+    emit("Phi-inverse (φ⁻¹):")
+    emit(str(suite.phiinv))
     
     # Print MUMs if requested and there are multiple documents
     if show_mums and suite.num_docs > 1:
-        print()
-        print("Maximal Unique Matches (MUMs):")
+        emit('')
+        emit("Maximal Unique Matches (MUMs):")
         mums = suite.find_mums()
         if mums:
             for i, (start, end) in enumerate(mums):
-                print(f"  MUM {i+1}: SA[{start}:{end}] (length {end-start})")
+                emit(f"  MUM {i+1}: SA[{start}:{end}] (length {end-start})")
                 # Show the actual suffixes for this MUM range
                 for j in range(start, end):
                     suffix_start = suite.sa[j]
                     suffix = suite.t[suffix_start:]
-                    print(f"    SA[{j}] = {suffix_start}: {suffix}")
+                    emit(f"    SA[{j}] = {suffix_start}: {suffix}")
         else:
-            print("  No MUMs found")
+            emit("  No MUMs found")
     
     if show_thresholds:
-        print()
-        print("Thresholds:")
+        emit('')
+        emit("Thresholds:")
         for char in suite.alphabet:
-            print(f"  {char}: {suite.thresholds[char]}")
+            emit(f"  {char}: {suite.thresholds[char]}")
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+
+def _render_to_file(path, t, **kwargs):
+    """Stream render() into path, replacing it only once rendering succeeds."""
+    # A temporary file beside path, so an error partway through leaves any
+    # existing file intact rather than half-overwritten.  A symlinked path is
+    # written through to its target, which keeps its permissions
+    path = os.path.realpath(path)
+    f = tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', buffering=1 << 20, dir=os.path.dirname(path),
+        prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False)
+    try:
+        with f:
+            render(t, out=f, **kwargs)
+        if os.path.exists(path):
+            shutil.copymode(path, f.name)
+        else:
+            # Temporary files are private; give a new file the usual mode
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(f.name, 0o666 & ~umask)
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+        raise
 
 
 def main():
@@ -946,6 +1081,8 @@ def main():
                               help='Show threshold arrays for each alphabet character')
     print_parser.add_argument('--show-mums', action='store_true',
                               help='Show Maximal Unique Matches (MUMs)')
+    print_parser.add_argument('--cache', action='store_true',
+                              help='Save the computed arrays under $XDG_CACHE_HOME/bwt-svg (default ~/.cache/bwt-svg) and reuse them for the same text')
 
     # Render subcommand
     render_parser = subparsers.add_parser('render', help='Generate SVG visualization')
@@ -968,49 +1105,42 @@ def main():
                               help='Show threshold arrays for each alphabet character')
     render_parser.add_argument('--show-guidelines', action='store_true',
                               help='Show guidelines in the SVG output')
+    render_parser.add_argument('--raster', action='store_true',
+                              help='Draw the BWM body as an embedded PNG to keep files for long inputs small (requires Pillow)')
+    render_parser.add_argument('--editor-mode', action='store_true',
+                              help='Keep nested groups (e.g. one per BWM column) as layers for graphics editors')
+    render_parser.add_argument('--cache', action='store_true',
+                              help='Save the computed arrays under $XDG_CACHE_HOME/bwt-svg (default ~/.cache/bwt-svg) and reuse them for the same text')
 
     args = parser.parse_args()
+    cache_dir = default_cache_dir() if getattr(args, 'cache', False) else None
 
     if args.command == 'print':
-        print_arrays(args.text, show_thresholds=args.show_thresholds, show_mums=args.show_mums)
+        print_arrays(args.text, show_thresholds=args.show_thresholds, show_mums=args.show_mums,
+                     cache_dir=cache_dir)
     elif args.command == 'render':
-        svg_content = render(args.text,
-               which="both",
-               background_color=args.background_color,
-               monospace_font=args.monospace_font,
-               label_font=args.label_font,
-               show_mums=args.show_mums,
-               show_thresholds=args.show_thresholds,
-               guidelines=args.show_guidelines)
-        with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(svg_content)
+        # Build the suite first, so a malformed text fails before any output
+        # file is touched
+        _get_suite(args.text, cache_dir)
+        options = dict(background_color=args.background_color,
+                       monospace_font=args.monospace_font,
+                       label_font=args.label_font,
+                       show_mums=args.show_mums,
+                       show_thresholds=args.show_thresholds,
+                       guidelines=args.show_guidelines,
+                       backend="raster" if args.raster else "svg",
+                       editor_mode=args.editor_mode,
+                       cache_dir=cache_dir)
+        _render_to_file(args.output, args.text, which="both", **options)
         print(f"SVG saved to {args.output}")
 
         if args.output_top:
-            svg_content = render(args.text,
-                which="horizontal",
-                background_color=args.background_color,
-                monospace_font=args.monospace_font,
-                label_font=args.label_font,
-                show_mums=args.show_mums,
-                show_thresholds=args.show_thresholds,
-                guidelines=args.show_guidelines)
-            with open(args.output_top, 'w', encoding='utf-8') as f:
-                f.write(svg_content)
+            _render_to_file(args.output_top, args.text, which="horizontal", **options)
             print(f"Top portion of SVG saved to {args.output_top}")
 
         if args.output_bottom:
-            svg_content = render(args.text,
-                which="vertical",
-                background_color=args.background_color,
-                monospace_font=args.monospace_font,
-                label_font=args.label_font,
-                show_mums=args.show_mums,
-                show_thresholds=args.show_thresholds,
-                guidelines=args.show_guidelines)
-            with open(args.output_bottom, 'w', encoding='utf-8') as f:
-                f.write(svg_content)
-            print(f"Bottom portion of SVG saved to {args.output_top}")
+            _render_to_file(args.output_bottom, args.text, which="vertical", **options)
+            print(f"Bottom portion of SVG saved to {args.output_bottom}")
     else:
         parser.print_help()
 
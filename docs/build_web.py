@@ -93,10 +93,10 @@ def generate_bwt_web(bwt_svg_dir, output_dir):
     
     for line in lines:
         if line.strip().startswith('import ') or line.strip().startswith('from '):
-            # Keep contextlib import since it's used in the code
-            if 'contextlib' in line or 'contextmanager' in line:
+            # Keep standard-library imports the rendering code relies on;
+            # drop argparse (CLI only) and the bwt import (inlined above)
+            if 'argparse' not in line and 'bwt' not in line:
                 filtered_lines.append(line)
-            # Remove other imports (argparse, relative imports, bwt imports)
             continue
         elif line.strip().startswith("if __name__ == '__main__':"):
             # Remove the main execution block since we don't need CLI in web interface
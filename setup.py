@@ -48,6 +48,9 @@ setup(
         "Topic :: Scientific/Engineering :: Visualization",
     ],
     python_requires=">=3.7",
+    extras_require={
+        "raster": ["Pillow"],
+    },
     entry_points={
         "console_scripts": [
             "bwt-svg=bwt_svg.svgize:main",
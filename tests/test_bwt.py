@@ -10,7 +10,16 @@ Date: 9/15/2025
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-from bwt_svg.bwt import BwtSuite
+import io
+import random
+import pytest
+import xml.etree.ElementTree as ET
+from bwt_svg.bwt import (BwtSuite, sa_prefix_doubling, sa_sais, sliding_min,
+                         thresholds_in_gap)
+from bwt_svg import bwt, svgize
+from bwt_svg.svgize import _coords, render
+
+SVG_NS = '{http://www.w3.org/2000/svg}'
 
 
 def test_bwt_1():
@@ -33,6 +42,25 @@ def test_sa_and_isa_1():
     assert suite.isa == [4, 6, 2, 3, 5, 1, 0]
 
 
+def test_sa_sais_1():
+    """Test SA-IS against naive suffix sorting on random texts"""
+    rng = random.Random(0)
+    for _ in range(100):
+        s = [rng.randint(1, 3) for _ in range(rng.randint(0, 40))] + [0]
+        naive = sorted(range(len(s)), key=lambda i: s[i:])
+        assert sa_sais(s, 4) == naive
+
+
+def test_sa_prefix_doubling_1():
+    """Test SA-IS against prefix doubling on longer random texts"""
+    rng = random.Random(1)
+    for alpha in (2, 4, 20):
+        s = [rng.randint(1, alpha) for _ in range(3000)] + [0]
+        assert sa_sais(s, alpha + 1) == sa_prefix_doubling(s)
+    s = [1] * 500 + [0]
+    assert sa_sais(s, 2) == sa_prefix_doubling(s) == list(range(500, -1, -1))
+
+
 def test_bwt_permutation_1():
     """Test whether we get the right BWT permutation"""
     suite = BwtSuite('abaaba$')
@@ -80,6 +108,84 @@ def test_lcp_from_t_sa_1():
     assert suite.lcp == [0, 0, 1, 1, 3, 0, 2]
 
 
+def test_lcs_from_t_sa_1():
+    """Test LCS from T and SA against naive comparison of BWM rows"""
+    suite = BwtSuite('abaaba$')
+    assert suite.lcs == [0, 0, 2, 0, 0, 0, 1]
+    t = 'gattacat$gattacgt$attcgt$#'
+    suite = BwtSuite(t)
+    rows = [t[i:] + t[:i] for i in suite.sa]
+    naive = [0] + [len(os.path.commonprefix([a[::-1], b[::-1]]))
+                   for a, b in zip(rows, rows[1:])]
+    assert suite.lcs == naive
+
+
+def test_thresholds_in_gap_1():
+    """Test threshold directions and their run-length encoding"""
+    assert thresholds_in_gap([3, 1, 2]) == (['^', '='], [('^', 1), ('=', 1), ('v', 1)])
+    assert thresholds_in_gap([2, 2, 2]) == (['=', '='], [('=', 3)])
+    assert thresholds_in_gap([]) == ([], [])
+
+
+def test_sliding_min_1():
+    """Test sliding-window minimum against slicing"""
+    rng = random.Random(0)
+    arr = [rng.randint(0, 9) for _ in range(50)]
+    for w in range(1, 8):
+        assert sliding_min(arr, w) == [min(arr[i:i+w]) for i in range(len(arr) - w + 1)]
+
+
+def test_find_mums_1():
+    """Test MUM detection over SA intervals"""
+    assert BwtSuite('gattaca$gatcaca#').find_mums() == [(4, 6), (11, 13)]
+    assert BwtSuite('abab$abba$baab#').find_mums() == [(11, 14)]
+    assert BwtSuite('GATTACA$').find_mums() == []
+
+
+def test_find_mums_trailing_doc_1():
+    """Test MUMs when text follows the last separator, against set-based windows"""
+    for t in ('ab$cd$ef!', 'gattaca$gatcaca$tt!'):
+        suite = BwtSuite(t)
+        d = suite.num_docs
+        naive = [(i, i + d) for i in range(suite.n - d)
+                 if min(suite.lcp[i+1:i+d]) > max(suite.lcp[i], suite.lcp[i+d])
+                 and len(set(suite.bwt[i:i+d])) != 1
+                 and len(set(suite.da[i:i+d])) == d]
+        assert suite.find_mums() == naive
+    assert BwtSuite('ab$cd$ef!').find_mums() == [(1, 3)]
+    assert BwtSuite('gattaca$gatcaca$tt!').find_mums() == [(5, 7), (12, 14)]
+
+
+def test_find_mums_cached_1():
+    """Test that repeated MUM queries reuse the result without sharing it"""
+    suite = BwtSuite('gattaca$gatcaca#')
+    mums = suite.find_mums()
+    mums.clear()
+    assert suite.find_mums() == [(4, 6), (11, 13)]
+
+
+def test_thresholds_1():
+    """Test per-character threshold arrays"""
+    suite = BwtSuite('abaaba$')
+    assert suite.thresholds == {
+        '$': ['v', 'v', 'v', 'v', ' ', '^', '^'],
+        'a': [' ', '=', 'v', ' ', '^', ' ', ' '],
+        'b': ['v', ' ', ' ', '^', '^', '^', '^'],
+    }
+
+
+def test_bwm_view_1():
+    """Test that BWM rows and columns built on demand match the rotations"""
+    t = 'gattacat$gattacgt$attcgt$#'
+    suite = BwtSuite(t)
+    rows = [t[i:] + t[:i] for i in suite.sa]
+    assert list(suite.bwm) == rows
+    assert suite.bwm[-1] == rows[-1] and suite.bwm[2:5] == rows[2:5]
+    for j in (0, 7, len(t) - 1):
+        assert suite.bwm.column(j) == [row[j] for row in rows]
+    assert suite.bwm.column(len(t) - 1) == list(suite.bwt)
+
+
 def test_gattacat_3():
     t = 'gattacat$gattacgt$attcgt$#'
     suite = BwtSuite(t)
@@ -131,3 +237,195 @@ def test_bwt_suite_2():
     assert len(suite.plcs) == len(suite.lcs)
     assert len(suite.lf) == len(suite.sa)
     assert len(suite.fl) == len(suite.sa)
+
+
+def test_render_threshold_columns_1():
+    """Test that threshold values land on their rows, across runs of blanks"""
+    # Vertical layout puts the BWM's first row at 3 * 35 px
+    svg = render('abaaba$', which='vertical', show_thresholds=True)
+    group = next(g for g in ET.fromstring(svg).iter(SVG_NS + 'g')
+                 if g.get('id') == 'Thresholds')
+    columns = [[(float(ts.get('y')), ts.text) for ts in text]
+               for text in group.iter(SVG_NS + 'text') if len(text)]
+    ys = _coords(3 * 35, -0.3, 35, 7)
+    thresholds = BwtSuite('abaaba$').thresholds
+    arrows = {'^': '\u2191', 'v': '\u2193', '=': '='}
+    for char, column in zip('ab', columns):
+        assert column == [(y, arrows[d]) for y, d in zip(ys, thresholds[char]) if d != ' ']
+
+
+def test_render_raster_1(monkeypatch):
+    """Test that the raster backend draws the BWM body, minus F and L, as one image"""
+    pytest.importorskip('PIL')
+    from bwt_svg import raster
+    drawn = []
+    draw_text = raster.BwmRaster.text
+    def record(self, x, y, char, color):
+        drawn.append((x, char))
+        draw_text(self, x, y, char, color)
+    monkeypatch.setattr(raster.BwmRaster, 'text', record)
+    t = 'abaaba$'
+    svg = render(t, backend='raster')
+    ET.fromstring(svg)
+    assert svg.count('<image') == 1
+    # Only the T row, F column and L column remain as text
+    assert svg.count('class="monospace"') == 3 * len(t)
+    # Columns 1 to n-2, each drawn once per row
+    assert len(drawn) == len(t) * (len(t) - 2)
+    assert len({x for x, _ in drawn}) == len(t) - 2
+    assert sorted(char for _, char in drawn) == sorted(t * (len(t) - 2))
+
+
+def test_render_raster_no_pillow_1(monkeypatch):
+    """Test that the raster backend asks for Pillow when it is missing"""
+    from bwt_svg import raster
+    monkeypatch.setattr(raster, 'Image', None)
+    with pytest.raises(ImportError, match='Pillow'):
+        render('abaaba$', backend='raster')
+
+
+def test_suite_cache_1(tmp_path, monkeypatch):
+    """Test that a cached BwtSuite, lazy arrays included, is reused from disk"""
+    t = 'gattaca$gatcaca#'
+    suite = svgize._load_suite(t, str(tmp_path))
+    assert [p.suffix for p in tmp_path.iterdir()] == ['.pkl']
+    # A hit must not build any suffix array, not even for the LCS
+    def fail(*args):
+        raise AssertionError('suite rebuilt')
+    monkeypatch.setattr(bwt, 'sa_sais', fail)
+    cached = svgize._load_suite(t, str(tmp_path))
+    assert cached is not suite
+    for name in ('sa', 'lcp', 'lcs', 'plcs', 'thresholds', 'mums'):
+        assert getattr(cached, name) == getattr(suite, name)
+
+
+def test_suite_cache_corrupt_1(tmp_path):
+    """Test that an unreadable cache file is rebuilt and replaced"""
+    t = 'abaaba$'
+    svgize._load_suite(t, str(tmp_path))
+    path, = tmp_path.iterdir()
+    path.write_bytes(b'not a pickle')
+    assert svgize._load_suite(t, str(tmp_path)).sa == [6, 5, 2, 3, 0, 4, 1]
+    with open(path, 'rb') as f:
+        assert svgize.pickle.load(f).t == t
+
+
+def test_suite_cache_write_failure_1(tmp_path, monkeypatch):
+    """Test that a failed cache write still returns the suite and leaves no file"""
+    def fail(obj, f, protocol=None):
+        f.write(b'partial')
+        raise OSError('disk full')
+    monkeypatch.setattr(svgize.pickle, 'dump', fail)
+    assert svgize._load_suite('abaaba$', str(tmp_path)).sa == [6, 5, 2, 3, 0, 4, 1]
+    assert list(tmp_path.iterdir()) == []
+    # An unusable cache directory is no different
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    assert svgize._load_suite('abaaba$', str(blocker)).sa == [6, 5, 2, 3, 0, 4, 1]
+
+
+def test_main_render_failure_1(tmp_path, monkeypatch):
+    """Test that a failed render leaves the existing output file alone"""
+    out = tmp_path / 'out.svg'
+    out.write_text('old')
+    monkeypatch.setattr(sys, 'argv', ['bwt-svg', 'render', 'abc', '-o', str(out)])
+    with pytest.raises(AssertionError):
+        svgize.main()
+    # Also when the failure comes after part of the SVG has been written
+    monkeypatch.setattr(sys, 'argv', ['bwt-svg', 'render', 'abaaba$', '-o', str(out)])
+    text_column = svgize._text_column
+    def fail(*args):
+        raise ValueError('render failed')
+    monkeypatch.setattr(svgize, '_text_column', fail)
+    with pytest.raises(ValueError):
+        svgize.main()
+    assert [p.name for p in tmp_path.iterdir()] == ['out.svg']
+    assert out.read_text() == 'old'
+    monkeypatch.setattr(svgize, '_text_column', text_column)
+    svgize.main()
+    ET.parse(str(out))
+
+
+def test_render_streaming_1():
+    """Test that streaming into a file writes exactly the returned SVG"""
+    for t, options in [('abaaba$', {}),
+                       ('gattaca$gatcaca#', dict(show_mums=True, show_thresholds=True)),
+                       ('how$now$brown$cow$#', dict(which='vertical', guidelines=True,
+                                                    background_color='#ffffff')),
+                       ('GATTACA$', dict(which='horizontal', editor_mode=True))]:
+        out = io.StringIO()
+        assert render(t, out=out, **options) is None
+        assert out.getvalue() == render(t, **options)
+
+
+def test_render_groups_1():
+    """Test that group ids are unique and groups balanced, with and without editor mode"""
+    t = 'gattaca$gatcaca#'
+    for editor_mode in (False, True):
+        svg = render(t, show_mums=True, show_thresholds=True, editor_mode=editor_mode)
+        ids = [g.get('id') for g in ET.fromstring(svg).iter(SVG_NS + 'g')]
+        assert len(ids) == len(set(ids))
+        assert svg.count('<g ') + svg.count('<g>') == svg.count('</g>')
+        assert ('BWMCol0' in ids) == editor_mode
+        assert 'BWM' in ids and 'Thresholds' in ids
+
+
+def test_render_which_1():
+    """Test that each part of the diagram is well-formed SVG on its own"""
+    for which in ('both', 'horizontal', 'vertical'):
+        for t in ('abaaba$', 'how$now$brown$cow$#'):
+            root = ET.fromstring(render(t, which=which, show_mums=True, show_thresholds=True))
+            assert root.tag == SVG_NS + 'svg'
+
+
+def test_suite_cache_warmup_failure_1(tmp_path, monkeypatch):
+    """Test that a failure building a lazy array doesn't fail a cache miss"""
+    assert svgize._load_suite('ab$cd$ef!', str(tmp_path / 'ok')).mums == [(1, 3)]
+    tmp_path = tmp_path / 'failed'
+    def fail(self):
+        raise IndexError('mums failed')
+    monkeypatch.setattr(bwt.BwtSuite, 'mums', bwt._cached_property(fail))
+    suite = svgize._load_suite('ab$cd$ef!', str(tmp_path))
+    assert suite.sa == BwtSuite('ab$cd$ef!').sa
+    assert not tmp_path.exists()
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='POSIX file modes and symlinks')
+def test_main_render_output_file_1(tmp_path, monkeypatch):
+    """Test that rendering over a file keeps its mode and writes through symlinks"""
+    target = tmp_path / 'target.svg'
+    target.write_text('old')
+    target.chmod(0o640)
+    link = tmp_path / 'link.svg'
+    link.symlink_to(target)
+    monkeypatch.setattr(sys, 'argv', ['bwt-svg', 'render', 'abaaba$', '-o', str(link)])
+    svgize.main()
+    assert link.is_symlink()
+    ET.parse(str(target))
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['link.svg', 'target.svg']
+    # A new file gets the usual mode rather than a temporary file's
+    new = tmp_path / 'new.svg'
+    monkeypatch.setattr(sys, 'argv', ['bwt-svg', 'render', 'abaaba$', '-o', str(new)])
+    umask = os.umask(0o022)
+    try:
+        svgize.main()
+    finally:
+        os.umask(umask)
+    assert new.stat().st_mode & 0o777 == 0o644
+
+
+def test_raster_rect_1():
+    """Test that raster rects cover the same pixels as the SVG rects they replace"""
+    pytest.importorskip('PIL')
+    from bwt_svg.raster import BwmRaster
+    canvas = BwmRaster(0, 0, 40, 40, 'Courier New')
+    canvas.rect(10, 5, 10, 20, 'blue-highlight')
+    canvas.rect(20, 5, 10, 20, 'blue-highlight')
+    alpha = canvas.rects.getchannel('A')
+    covered = [(x, y) for x in range(40) for y in range(40) if alpha.getpixel((x, y))]
+    assert len(covered) == 20 * 20
+    assert {x for x, _ in covered} == set(range(10, 30))
+    assert {y for _, y in covered} == set(range(5, 25))
+    # Adjacent rects meet without overlapping
+    assert len({alpha.getpixel(p) for p in covered}) == 1